@@ -0,0 +1,147 @@
+import random
+import sys
+import time
+import tracemalloc
+
+from logic import *
+
+# Default numbers of people in the generated puzzles
+SIZES = [3, 6, 10, 12, 100, 300]
+
+# Largest number of symbols each exhaustive engine is run on
+LIMITS = {
+    "enumerate": 24,
+    "parallel": 24,
+    "vector": 20
+}
+
+
+def knight(person):
+    return Symbol(f"{person} is a Knight")
+
+
+def knave(person):
+    return Symbol(f"{person} is a Knave")
+
+
+def random_statement(people, depth, rng):
+    """Returns a random claim about the given people."""
+    if depth == 0 or rng.random() < 0.3:
+        person = rng.choice(people)
+        return knight(person) if rng.random() < 0.5 else knave(person)
+    kind = rng.randrange(5)
+    if kind == 0:
+        return Not(random_statement(people, depth - 1, rng))
+    elif kind == 1:
+        return And(*[random_statement(people, depth - 1, rng)
+                     for _ in range(rng.randrange(2, 4))])
+    elif kind == 2:
+        return Or(*[random_statement(people, depth - 1, rng)
+                    for _ in range(rng.randrange(2, 4))])
+    elif kind == 3:
+        return Implication(random_statement(people, depth - 1, rng),
+                           random_statement(people, depth - 1, rng))
+    else:
+        return Biconditional(random_statement(people, depth - 1, rng),
+                             random_statement(people, depth - 1, rng))
+
+
+def generate_puzzle(n, statements=2, depth=2, seed=None):
+    """
+    Generates a knights and knaves puzzle about `n` people.
+
+    Each person makes `statements` random claims about up to 3 people.
+    Claims are chosen so that some hidden assignment of knights and
+    knaves satisfies them, so the knowledge base is always consistent.
+    Returns the knowledge base and the list of symbols to ask about.
+    """
+    rng = random.Random(seed)
+    people = [f"P{i}" for i in range(n)]
+    hidden = {person: rng.random() < 0.5 for person in people}
+    world = dict()
+    for person in people:
+        world[knight(person).name] = hidden[person]
+        world[knave(person).name] = not hidden[person]
+
+    knowledge = And()
+    for person in people:
+
+        # Game rules
+        knowledge.add(Or(knight(person), knave(person)))
+        knowledge.add(Not(And(knight(person), knave(person))))
+
+        # Knights tell the truth and knaves lie
+        for _ in range(statements):
+            about = rng.sample(people, min(3, n))
+            statement = random_statement(about, depth, rng)
+            if statement.evaluate(world) != hidden[person]:
+                statement = Not(statement)
+            knowledge.add(Implication(statement, knight(person)))
+            knowledge.add(Implication(Not(statement), knave(person)))
+
+    symbols = [s(person) for person in people for s in (knight, knave)]
+    return knowledge, symbols
+
+
+def inference_entails_all(knowledge, queries):
+    """Returns the queries the forward-chaining engine can derive."""
+    engine = InferenceEngine()
+    engine.tell(knowledge)
+    return [query for query in queries if engine.ask(query)]
+
+
+def parallel_entails_all(knowledge, queries):
+    """Returns the queries entailed according to parallel enumeration."""
+    return [query for query in queries
+            if parallel_model_check(knowledge, query)]
+
+
+ENGINES = {
+    "enumerate": lambda k, q: model_check_all(k, q, method="enumerate"),
+    "vector": lambda k, q: model_check_all(k, q, method="vector"),
+    "sat": lambda k, q: model_check_all(k, q, method="sat"),
+    "parallel": parallel_entails_all,
+    "inference": inference_entails_all
+}
+
+
+def measure(engine, knowledge, queries):
+    """
+    Runs an engine, returning its answer, its running time and the peak
+    memory it allocated (in this process).
+    """
+    start = time.perf_counter()
+    answer = engine(knowledge, queries)
+    seconds = time.perf_counter() - start
+
+    # Measure memory on a separate run, as tracing slows everything down
+    tracemalloc.start()
+    engine(knowledge, queries)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return answer, seconds, peak
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for n in sizes:
+        knowledge, symbols = generate_puzzle(n, seed=n)
+        print(f"{n} people, {len(symbols)} symbols, "
+              f"{len(knowledge.conjuncts)} sentences")
+
+        # The SAT engine is exact at every size, so it is the reference
+        expected = model_check_all(knowledge, symbols, method="sat")
+        for name, engine in ENGINES.items():
+            if len(symbols) > LIMITS.get(name, len(symbols)):
+                print(f"    {name:>10}: skipped")
+                continue
+            answer, seconds, peak = measure(engine, knowledge, symbols)
+            note = "" if answer == expected else (
+                f" ({len(answer)} of {len(expected)} answers)"
+            )
+            print(f"    {name:>10}: {seconds:9.4f} s "
+                  f"{peak / 2 ** 20:9.2f} MiB{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,134 @@
+import collections
+import functools
+import heapq
 import itertools
+import multiprocessing
+import os
+import re
+import time
+import weakref
+
+import numpy as np
+
+# Bit patterns of the first six symbols within one 64-model word
+WORD_PATTERNS = [
+    0xAAAAAAAAAAAAAAAA,
+    0xCCCCCCCCCCCCCCCC,
+    0xF0F0F0F0F0F0F0F0,
+    0xFF00FF00FF00FF00,
+    0xFFFF0000FFFF0000,
+    0xFFFFFFFF00000000
+]
+
+# Largest number of symbols evaluated as a packed truth table (8 MiB/column)
+MAX_VECTOR_SYMBOLS = 26
+
+# Words of a packed truth table evaluated at a time (128 KiB/column)
+BLOCK_WORDS = 2 ** 14
+
+
+class Interned(type):
+    """
+    Metaclass that shares one node between structurally identical
+    sentences, so repeated sub-sentences cost no extra memory and their
+    cached hashes, symbols and formulas are computed once.
+
+    A new And can still grow with `And.add`, so it is only shared once
+    it is used inside another sentence, and cannot grow after that.
+    Until then it is a knowledge base of its own.
+    """
+
+    # Interned nodes, keyed by class and operands
+    nodes = weakref.WeakValueDictionary()
+
+    def __call__(cls, *operands):
+        operands = [Interned.share(operand) for operand in operands]
+        if cls.growable:
+            return super().__call__(*operands)
+
+        key = (cls, *operands)
+        try:
+            node = Interned.nodes.get(key)
+        except TypeError:
+            node = None
+        if node is None:
+            node = super().__call__(*operands)
+            node.shared = True
+            Interned.nodes[key] = node
+        return node
+
+    @staticmethod
+    def share(operand):
+        """
+        Returns the shared node for a sentence about to be used as an
+        operand, sharing the sentence itself if there is none yet.
+        """
+        if not isinstance(operand, Sentence) or operand.shared:
+            return operand
+
+        # The sentence can no longer grow, whichever node is used
+        operand.shared = True
+        key = (type(operand), *operand.operands())
+        try:
+            node = Interned.nodes.get(key)
+        except TypeError:
+            return operand
+        if node is None:
+            node = operand
+            Interned.nodes[key] = node
+        return node
+
+
+def cached(method):
+    """
+    Caches the result of a sentence method on the sentence.
+    """
+    name = "_" + method.__name__.strip("_")
+
+    @functools.wraps(method)
+    def wrapper(self):
+        value = self.__dict__.get(name)
+        if value is None:
+            value = method(self)
+            setattr(self, name, value)
+        return value
+
+    return wrapper
+
 
+class Sentence(metaclass=Interned):
 
-class Sentence():
+    # Whether sentences of the class can have operands added
+    growable = False
+
+    # Whether the node may be part of other sentences, so must not change
+    shared = False
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave symbols
+        unassigned. Returns None if the value depends on them.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return frozenset()
+
+    def operands(self):
+        """Returns the arguments the sentence was constructed from."""
+        return ()
+
+    def __reduce__(self):
+        return (type(self), self.operands())
 
     @classmethod
     def validate(cls, sentence):
@@ -50,6 +165,7 @@ class Symbol(Sentence):
     def __eq__(self, other):
         return isinstance(other, Symbol) and self.name == other.name
 
+    @cached
     def __hash__(self):
         return hash(("symbol", self.name))
 
@@ -62,11 +178,18 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        return model.get(self.name)
+
     def formula(self):
         return self.name
 
+    @cached
     def symbols(self):
-        return {self.name}
+        return frozenset([self.name])
+
+    def operands(self):
+        return (self.name,)
 
 
 class Not(Sentence):
@@ -75,8 +198,11 @@ class Not(Sentence):
         self.operand = operand
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand
+        )
 
+    @cached
     def __hash__(self):
         return hash(("not", hash(self.operand)))
 
@@ -86,22 +212,35 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
+    @cached
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
     def symbols(self):
         return self.operand.symbols()
 
+    def operands(self):
+        return (self.operand,)
+
 
 class And(Sentence):
+    growable = True
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And) and self.conjuncts == other.conjuncts
+        )
 
+    @cached
     def __hash__(self):
         return hash(
             ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
@@ -115,19 +254,41 @@ class And(Sentence):
 
     def add(self, conjunct):
         Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        if self.shared:
+            raise ValueError("cannot add to a sentence used in another one")
+        self.conjuncts.append(Interned.share(conjunct))
+        self._hash = self._symbols = self._formula = None
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
+    @cached
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                           for conjunct in self.conjuncts])
+        return " ∧ ".join(
+            [Sentence.parenthesize(conjunct.formula())
+             for conjunct in self.conjuncts]
+        )
 
+    @cached
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        return frozenset().union(
+            *[conjunct.symbols() for conjunct in self.conjuncts]
+        )
+
+    def operands(self):
+        return tuple(self.conjuncts)
 
 
 class Or(Sentence):
@@ -137,8 +298,11 @@ class Or(Sentence):
         self.disjuncts = list(disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and self.disjuncts == other.disjuncts
+        )
 
+    @cached
     def __hash__(self):
         return hash(
             ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
@@ -151,14 +315,33 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
+    @cached
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+        return " ∨  ".join(
+            [Sentence.parenthesize(disjunct.formula())
+             for disjunct in self.disjuncts]
+        )
 
+    @cached
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        return frozenset().union(
+            *[disjunct.symbols() for disjunct in self.disjuncts]
+        )
+
+    def operands(self):
+        return tuple(self.disjuncts)
 
 
 class Implication(Sentence):
@@ -169,10 +352,13 @@ class Implication(Sentence):
         self.consequent = consequent
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent
+        )
 
+    @cached
     def __hash__(self):
         return hash(("implies", hash(self.antecedent), hash(self.consequent)))
 
@@ -183,13 +369,29 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
+    @cached
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
+    @cached
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        return self.antecedent.symbols() | self.consequent.symbols()
+
+    def operands(self):
+        return (self.antecedent, self.consequent)
 
 
 class Biconditional(Sentence):
@@ -200,10 +402,13 @@ class Biconditional(Sentence):
         self.right = right
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional)
+            and self.left == other.left
+            and self.right == other.right
+        )
 
+    @cached
     def __hash__(self):
         return hash(("biconditional", hash(self.left), hash(self.right)))
 
@@ -211,53 +416,1388 @@ class Biconditional(Sentence):
         return f"Biconditional({self.left}, {self.right})"
 
     def evaluate(self, model):
-        return ((self.left.evaluate(model)
-                 and self.right.evaluate(model))
-                or (not self.left.evaluate(model)
-                    and not self.right.evaluate(model)))
-
+        return self.left.evaluate(model) == self.right.evaluate(model)
+
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
+    @cached
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
+    @cached
     def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+        return self.left.symbols() | self.right.symbols()
+
+    def operands(self):
+        return (self.left, self.right)
+
+
+class Circuit():
+    """
+    Sentences compiled into a DAG of shared nodes.
+
+    Each distinct sub-sentence becomes one node, listed after all of its
+    operands, so evaluating the nodes in order computes every shared
+    sub-sentence once per model, without recursion.
+    """
+
+    def __init__(self, sentences):
+
+        # Nodes are (operator, operands) pairs; operands are node indices,
+        # or the name for symbols
+        self.nodes = []
+        self.outputs = []
+        self.symbols = []
+
+        # Sentences already compiled, by identity, so nothing is hashed
+        # or compared recursively, and nodes by (operator, operands), so
+        # equal sentences that are separate objects still share a node
+        compiled = dict()
+        index = dict()
+
+        for sentence in sentences:
+            Sentence.validate(sentence)
+
+            # Add operands before the sentences that use them
+            stack = [sentence]
+            while stack:
+                node = stack[-1]
+                if id(node) in compiled:
+                    stack.pop()
+                    continue
+                operands = () if isinstance(node, Symbol) else node.operands()
+                pending = [operand for operand in operands
+                           if id(operand) not in compiled]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+
+                if isinstance(node, Symbol):
+                    key = ("symbol", node.name)
+                else:
+                    key = (
+                        Circuit.OPERATORS[type(node)],
+                        tuple(compiled[id(operand)] for operand in operands)
+                    )
+                if key not in index:
+                    index[key] = len(self.nodes)
+                    self.nodes.append(key)
+                    if isinstance(node, Symbol):
+                        self.symbols.append(node.name)
+                compiled[id(node)] = index[key]
+
+            self.outputs.append(compiled[id(sentence)])
+
+    OPERATORS = {
+        Not: "not",
+        And: "and",
+        Or: "or",
+        Implication: "implies",
+        Biconditional: "iff"
+    }
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
+    def evaluate(self, model):
+        """Evaluates each compiled sentence in a model."""
+        values = []
+        for operator, operands in self.nodes:
+            if operator == "symbol":
+                try:
+                    value = bool(model[operands])
+                except KeyError:
+                    raise Exception(f"variable {operands} not in model")
+            elif operator == "not":
+                value = not values[operands[0]]
+            elif operator == "and":
+                value = all(values[i] for i in operands)
+            elif operator == "or":
+                value = any(values[i] for i in operands)
+            elif operator == "implies":
+                value = not values[operands[0]] or values[operands[1]]
+            else:
+                value = values[operands[0]] == values[operands[1]]
+            values.append(value)
+        return [values[i] for i in self.outputs]
+
+    def evaluate_partial(self, model):
+        """
+        Evaluates each compiled sentence in a model that may leave
+        symbols unassigned, giving None where the value depends on them.
+        """
+        values = []
+        for operator, operands in self.nodes:
+            if operator == "symbol":
+                value = model.get(operands)
+            elif operator == "not":
+                value = values[operands[0]]
+                if value is not None:
+                    value = not value
+            elif operator == "and":
+                value = True
+                for i in operands:
+                    if values[i] is False:
+                        value = False
+                        break
+                    if values[i] is None:
+                        value = None
+            elif operator == "or":
+                value = False
+                for i in operands:
+                    if values[i] is True:
+                        value = True
+                        break
+                    if values[i] is None:
+                        value = None
+            elif operator == "implies":
+                antecedent = values[operands[0]]
+                consequent = values[operands[1]]
+                if antecedent is False or consequent is True:
+                    value = True
+                elif antecedent is None or consequent is None:
+                    value = None
+                else:
+                    value = False
+            else:
+                left = values[operands[0]]
+                right = values[operands[1]]
+                value = None if left is None or right is None else left == right
+            values.append(value)
+        return [values[i] for i in self.outputs]
+
+    def truth_tables(self, symbols):
+        """
+        Evaluates each compiled sentence in every model of `symbols` at
+        once, returning packed columns as described for `truth_table`.
+        """
+        symbols = list(symbols)
+        words = max(1, 2 ** (len(symbols) - 6))
+        columns = [np.empty(words, dtype=np.uint64) for _ in self.outputs]
+        start = 0
+        for block in self.truth_table_blocks(symbols):
+            for column, values in zip(columns, block):
+                column[start:start + len(values)] = values
+            start += len(block[0])
+        return columns
+
+    def truth_table_blocks(self, symbols):
+        """
+        Yields the packed columns of `truth_tables` a block of at most
+        BLOCK_WORDS words at a time, so memory use does not grow with the
+        number of models.
+        """
+        symbols = list(symbols)
+        if len(symbols) > MAX_VECTOR_SYMBOLS:
+            raise ValueError(
+                f"too many symbols for a truth table: {len(symbols)}"
+            )
+        words = max(1, 2 ** (len(symbols) - 6))
+        positions = {name: i for i, name in enumerate(symbols)}
+        ones = ~np.uint64(0)
+
+        # Count the uses of each node, so its column can be dropped as
+        # soon as the last sentence using it has been evaluated
+        uses = [0] * len(self.nodes)
+        for operator, operands in self.nodes:
+            if operator != "symbol":
+                for i in operands:
+                    uses[i] += 1
+        for i in self.outputs:
+            uses[i] += 1
+
+        for start in range(0, words, BLOCK_WORDS):
+            size = min(BLOCK_WORDS, words - start)
+            index = np.arange(start, start + size, dtype=np.uint64)
+            remaining = list(uses)
+
+            values = []
+            for operator, operands in self.nodes:
+                if operator == "symbol":
+                    try:
+                        i = positions[operands]
+                    except KeyError:
+                        raise Exception(f"variable {operands} not in model")
+
+                    # A symbol's column repeats within a word or spans
+                    # whole words
+                    if i < 6:
+                        value = np.full(size, WORD_PATTERNS[i],
+                                        dtype=np.uint64)
+                    else:
+                        bit = (index >> np.uint64(i - 6)) & np.uint64(1)
+                        value = np.where(bit, ones, np.uint64(0))
+                    values.append(value)
+                    continue
+
+                if operator == "not":
+                    value = ~values[operands[0]]
+                elif operator == "and":
+                    value = np.full(size, ones, dtype=np.uint64)
+                    for i in operands:
+                        value &= values[i]
+                elif operator == "or":
+                    value = np.zeros(size, dtype=np.uint64)
+                    for i in operands:
+                        value |= values[i]
+                elif operator == "implies":
+                    value = ~values[operands[0]]
+                    value |= values[operands[1]]
+                else:
+                    value = values[operands[0]] ^ values[operands[1]]
+                    np.invert(value, out=value)
+                values.append(value)
+
+                for i in operands:
+                    remaining[i] -= 1
+                    if not remaining[i]:
+                        values[i] = None
+            yield [values[i] for i in self.outputs]
+
+
+def model_check(knowledge, query, method="enumerate"):
+    """
+    Checks if knowledge base entails query.
+
+    `method` selects the decision procedure: "enumerate" checks every
+    model of the symbols involved, "vector" evaluates both sentences over
+    all models at once with bitwise array operations, "parallel"
+    enumerates models on several processes, and "sat" asks the SAT
+    solver whether knowledge ∧ ¬query is unsatisfiable.
+    """
+    if method == "sat":
+        return sat_entails(knowledge, query)
+    elif method == "vector":
+        return vector_entails(knowledge, query)
+    elif method == "parallel":
+        return parallel_model_check(knowledge, query)
+    elif method != "enumerate":
+        raise ValueError(f"unknown model checking method {method!r}")
+
+    # Get all symbols in both knowledge and query, most frequent first
+    circuit = Circuit([knowledge, query])
+    frequency = occurrences(knowledge) + occurrences(query)
+    symbols = sorted(circuit.symbols,
+                     key=lambda name: (-frequency[name], name))
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+    # Check that knowledge entails query
+    return check_all(circuit, symbols, dict())
+
+
+def check_all(circuit, symbols, model):
+    """Checks if knowledge base entails query, given a partial model."""
+
+    # If knowledge base is already false, no extension can refute query
+    known, answer = circuit.evaluate_partial(model)
+    if known is False:
+        return True
+
+    # If query is already true, it holds wherever knowledge base does
+    if answer is True:
+        return True
+
+    # If knowledge base is already true, query must not be false
+    if known is True and answer is False:
+        return False
+
+    # Choose the next unused symbol, assigning it in place
+    p = symbols[len(model)]
+    for value in (True, False):
+        model[p] = value
+        entailed = check_all(circuit, symbols, model)
+        del model[p]
+
+        # Ensure entailment holds in both models
+        if not entailed:
+            return False
+    return True
+
+
+def occurrences(sentence):
+    """Counts how many times each symbol occurs in a sentence."""
+    counts = collections.Counter()
+    stack = [sentence]
+    while stack:
+        sentence = stack.pop()
+        if isinstance(sentence, Symbol):
+            counts[sentence.name] += 1
         else:
+            stack.extend(sentence.operands())
+    return counts
+
+
+def model_check_all(knowledge, queries, method="enumerate"):
+    """
+    Returns the queries that knowledge base entails, in their original
+    order, deciding all of them in a single pass over the models of the
+    knowledge base. `method` is as for `model_check`.
+    """
+    queries = list(queries)
+    if method == "sat":
+        return sat_entails_all(knowledge, queries)
+    elif method == "vector":
+        return vector_entails_all(knowledge, queries)
+    elif method != "enumerate":
+        raise ValueError(f"unknown model checking method {method!r}")
+
+    def filter_all(circuit, candidates, symbols, model):
+        """Removes candidates that are false in some model of knowledge."""
+
+        # If knowledge base is already false, no extension refutes anything
+        known, *answers = circuit.evaluate_partial(model)
+        if known is False:
+            return
+
+        # If knowledge base is already true, drop candidates already false
+        if known is True:
+            undecided = False
+            for i, answer in enumerate(answers):
+                if i not in candidates:
+                    continue
+                if answer is False:
+                    candidates.remove(i)
+                elif answer is None:
+                    undecided = True
+            if not undecided:
+                return
+
+        # Choose the next unused symbol, assigning it in place
+        p = symbols[len(model)]
+        for value in (True, False):
+            model[p] = value
+            filter_all(circuit, candidates, symbols, model)
+            del model[p]
+            if not candidates:
+                return
+
+    # Get all symbols in knowledge and queries, most frequent first
+    circuit = Circuit([knowledge] + queries)
+    frequency = occurrences(knowledge)
+    symbols = sorted(circuit.symbols,
+                     key=lambda name: (-frequency[name], name))
+
+    # Enumerate models once, keeping the queries true in all of them
+    candidates = set(range(len(queries)))
+    filter_all(circuit, candidates, symbols, dict())
+    return [query for i, query in enumerate(queries) if i in candidates]
+
+
+# Circuit and symbol order of the model check run by a worker process
+worker = dict()
+
+
+def start_worker(circuit, symbols):
+    """Sets up a worker process for `parallel_model_check`."""
+    worker["circuit"] = circuit
+    worker["symbols"] = symbols
+
+
+def check_prefix(values):
+    """Checks entailment in the models that start with the given values."""
+    symbols = worker["symbols"]
+    model = dict(zip(symbols, values))
+    return check_all(worker["circuit"], symbols, model)
+
+
+def parallel_model_check(knowledge, query, processes=None, prefix=None,
+                         stats=None):
+    """
+    Checks if knowledge base entails query, enumerating models on
+    several processes.
+
+    The first `prefix` symbols are fixed to each of their 2 ** prefix
+    assignments, and each assignment is checked as a separate task. All
+    workers are stopped as soon as one task finds a counter-model. If
+    `stats` is a dictionary, it receives the number of models covered,
+    the time taken and the throughput in models per second.
+    """
+    start = time.perf_counter()
+
+    # Get all symbols in both knowledge and query, most frequent first
+    circuit = Circuit([knowledge, query])
+    frequency = occurrences(knowledge) + occurrences(query)
+    symbols = sorted(circuit.symbols,
+                     key=lambda name: (-frequency[name], name))
+
+    # Use a few more tasks than processes to balance the load
+    processes = processes or os.cpu_count() or 1
+    if prefix is None:
+        prefix = (processes - 1).bit_length() + 3
+    prefix = min(prefix, len(symbols))
+    prefixes = itertools.product((True, False), repeat=prefix)
+
+    # Leaving the pool terminates any workers still running
+    entailed = True
+    checked = 0
+    with multiprocessing.Pool(processes, initializer=start_worker,
+                              initargs=(circuit, symbols)) as pool:
+        for result in pool.imap_unordered(check_prefix, prefixes):
+            if not result:
+                entailed = False
+                break
+            checked += 1
+
+    if stats is not None:
+        seconds = time.perf_counter() - start
+        models = checked * 2 ** (len(symbols) - prefix)
+        stats["models"] = models
+        stats["seconds"] = seconds
+        stats["models_per_second"] = models / seconds if seconds else 0.0
+    return entailed
+
+
+class CNF():
+    """
+    Clausal form of logical sentences over integer variables.
+
+    Symbols are numbered from 1 and clauses are lists of non-zero
+    integers, as in the DIMACS format: `v` means the variable is true and
+    `-v` means it is false. Top-level conjunctions and disjunctions are
+    flattened into clauses directly, and every other nested sub-sentence
+    gets an auxiliary variable (Tseitin encoding), so the number of
+    clauses grows linearly with the size of the sentence. Definitions are
+    only emitted in the direction the sub-sentence is used in
+    (Plaisted-Greenbaum), and shared sub-sentences are defined once.
+    """
+
+    def __init__(self):
+        self.variables = dict()
+        self.names = [None]
+        self.clauses = []
+        self.definitions = dict()
+        self.pending = []
+
+    def variable(self, name=None):
+        """
+        Returns the variable number of the symbol called `name`,
+        allocating it if needed. Without a name, allocates a new
+        auxiliary variable.
+        """
+        if name is not None and name in self.variables:
+            return self.variables[name]
+        self.names.append(name)
+        variable = len(self.names) - 1
+        if name is not None:
+            self.variables[name] = variable
+        return variable
+
+    def add(self, sentence, positive=True):
+        """
+        Adds clauses asserting that `sentence` is true (or false if
+        `positive` is False). Returns the list of clauses that were added.
+        """
+        Sentence.validate(sentence)
+        start = len(self.clauses)
+
+        # Split the sentence into top-level conjuncts
+        stack = [(sentence, positive)]
+        while stack:
+            sentence, positive = stack.pop()
+            if isinstance(sentence, Not):
+                stack.append((sentence.operand, not positive))
+            elif isinstance(sentence, And) and positive:
+                stack.extend((c, True) for c in reversed(sentence.conjuncts))
+            elif isinstance(sentence, Or) and not positive:
+                stack.extend((d, False) for d in reversed(sentence.disjuncts))
+            elif isinstance(sentence, Implication) and not positive:
+                stack.append((sentence.consequent, False))
+                stack.append((sentence.antecedent, True))
+            elif isinstance(sentence, Biconditional):
+                left = self.literal(sentence.left, True)
+                self.literal(sentence.left, False)
+                right = self.literal(sentence.right, True)
+                self.literal(sentence.right, False)
+                if positive:
+                    self.emit([-left, right])
+                    self.emit([left, -right])
+                else:
+                    self.emit([left, right])
+                    self.emit([-left, -right])
+            else:
+                self.emit(self.clause([(sentence, positive)]))
+
+            # Define auxiliary variables introduced by this conjunct
+            self.define_pending()
+
+        return self.clauses[start:]
+
+    def define(self, sentence):
+        """
+        Returns a literal equivalent to `sentence`, adding the clauses
+        that define it in both directions.
+        """
+        literal = self.literal(sentence, True)
+        self.literal(sentence, False)
+        self.define_pending()
+        return literal
+
+    def emit(self, clause):
+        """Adds a clause unless it is a tautology."""
+        literals = set(clause)
+        if any(-literal in literals for literal in literals):
+            return
+        self.clauses.append(list(dict.fromkeys(clause)))
+
+    def clause(self, disjuncts):
+        """
+        Returns a clause equivalent to the disjunction of the given
+        (sentence, positive) pairs, flattening nested disjunctions.
+        """
+        literals = []
+        stack = list(reversed(disjuncts))
+        while stack:
+            sentence, positive = stack.pop()
+            if isinstance(sentence, Not):
+                stack.append((sentence.operand, not positive))
+            elif isinstance(sentence, Or) and positive:
+                stack.extend((d, True) for d in reversed(sentence.disjuncts))
+            elif isinstance(sentence, And) and not positive:
+                stack.extend((c, False) for c in reversed(sentence.conjuncts))
+            elif isinstance(sentence, Implication) and positive:
+                stack.append((sentence.consequent, True))
+                stack.append((sentence.antecedent, False))
+            else:
+                literals.append(self.literal(sentence, positive))
+        return literals
+
+    def literal(self, sentence, positive=True):
+        """
+        Returns a literal standing for `sentence` (negated if `positive`
+        is False) that may be used inside a clause.
+        """
+        while isinstance(sentence, Not):
+            sentence = sentence.operand
+            positive = not positive
+        if isinstance(sentence, Symbol):
+            variable = self.variable(sentence.name)
+            return variable if positive else -variable
+
+        # Sub-sentences get an auxiliary variable defined on demand
+        if sentence not in self.definitions:
+            self.definitions[sentence] = [self.variable(), set()]
+        variable, polarities = self.definitions[sentence]
+        if positive not in polarities:
+            polarities.add(positive)
+            self.pending.append((sentence, positive))
+        return variable if positive else -variable
+
+    def define_pending(self):
+        """Emits definition clauses for auxiliary variables in use."""
+        while self.pending:
+            sentence, positive = self.pending.pop()
+            x = self.definitions[sentence][0]
+
+            # Positive occurrences need x => sentence
+            if positive:
+                if isinstance(sentence, And):
+                    for conjunct in sentence.conjuncts:
+                        self.emit([-x] + self.clause([(conjunct, True)]))
+                elif isinstance(sentence, Or):
+                    self.emit([-x] + self.clause(
+                        [(disjunct, True) for disjunct in sentence.disjuncts]
+                    ))
+                elif isinstance(sentence, Implication):
+                    self.emit([-x] + self.clause([
+                        (sentence.antecedent, False),
+                        (sentence.consequent, True)
+                    ]))
+                elif isinstance(sentence, Biconditional):
+                    left = self.literal(sentence.left, True)
+                    self.literal(sentence.left, False)
+                    right = self.literal(sentence.right, True)
+                    self.literal(sentence.right, False)
+                    self.emit([-x, -left, right])
+                    self.emit([-x, left, -right])
+
+            # Negative occurrences need sentence => x
+            else:
+                if isinstance(sentence, And):
+                    self.emit([x] + self.clause(
+                        [(conjunct, False) for conjunct in sentence.conjuncts]
+                    ))
+                elif isinstance(sentence, Or):
+                    for disjunct in sentence.disjuncts:
+                        self.emit([x] + self.clause([(disjunct, False)]))
+                elif isinstance(sentence, Implication):
+                    self.emit([x] + self.clause([(sentence.antecedent, True)]))
+                    self.emit([x] + self.clause([(sentence.consequent, False)]))
+                elif isinstance(sentence, Biconditional):
+                    left = self.literal(sentence.left, True)
+                    self.literal(sentence.left, False)
+                    right = self.literal(sentence.right, True)
+                    self.literal(sentence.right, False)
+                    self.emit([x, left, right])
+                    self.emit([x, -left, -right])
+
+
+class Solver():
+    """
+    CDCL SAT solver over DIMACS-style clauses.
+
+    Uses two watched literals per clause for unit propagation, learns a
+    first-UIP clause on every conflict and backjumps non-chronologically.
+    Decisions follow variable activity (VSIDS) with phase saving, and the
+    search restarts on a geometric schedule. Clauses may be added between
+    calls to `solve`, which keeps everything learned so far.
+    """
+
+    def __init__(self, clauses=()):
+        self.clauses = []
+        self.watches = dict()
+        self.values = dict()
+        self.levels = dict()
+        self.reasons = dict()
+        self.phases = dict()
+        self.activity = dict()
+        self.increment = 1.0
+        self.order = []
+        self.trail = []
+        self.limits = []
+        self.head = 0
+        self.ok = True
+        self.model = None
+        self.conflicts = 0
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def value(self, literal):
+        """Returns the value of a literal, or None if it is unassigned."""
+        value = self.values.get(abs(literal))
+        if value is None or literal > 0:
+            return value
+        return not value
+
+    def add_variable(self, variable):
+        """Registers a variable with the decision heuristic."""
+        if variable not in self.activity:
+            self.activity[variable] = 0.0
+            heapq.heappush(self.order, (0.0, variable))
+
+    def add_clause(self, clause):
+        """
+        Adds a clause to the solver. Returns False if the clauses
+        are now known to be unsatisfiable.
+        """
+        self.backtrack(0)
+        if not self.ok:
+            return False
+
+        # Simplify with respect to top-level assignments
+        literals = []
+        for literal in dict.fromkeys(clause):
+            self.add_variable(abs(literal))
+            value = self.value(literal)
+            if value is True or -literal in literals:
+                return True
+            if value is None:
+                literals.append(literal)
+
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(literals)
+        return self.ok
+
+    def attach(self, literals):
+        """Stores a clause and watches its first two literals."""
+        self.clauses.append(literals)
+        index = len(self.clauses) - 1
+        self.watches.setdefault(literals[0], []).append(index)
+        self.watches.setdefault(literals[1], []).append(index)
+        return index
+
+    def assign(self, literal, reason):
+        """Makes a literal true at the current decision level."""
+        variable = abs(literal)
+        self.values[variable] = literal > 0
+        self.levels[variable] = len(self.limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagates all pending assignments. Returns the index of a
+        conflicting clause, or None if there is no conflict.
+        """
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watchers = self.watches.get(false_literal, [])
+            kept = []
+            conflict = None
+            for position, index in enumerate(watchers):
+                clause = self.clauses[index]
+
+                # Make sure the false literal is the second watch
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+
+                # Clause already satisfied by its other watch
+                first = self.value(clause[0])
+                if first is True:
+                    kept.append(index)
+                    continue
+
+                # Look for a new literal to watch
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if first is False:
+                        conflict = index
+                        kept.extend(watchers[position + 1:])
+                        break
+                    self.assign(clause[0], index)
+
+            self.watches[false_literal] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derives a first-UIP clause from a conflict. Returns the learned
+        clause, with its asserting literal first, and the backjump level.
+        """
+        level = len(self.limits)
+        learned = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+
+        while True:
+            for q in (clause if literal is None else clause[1:]):
+                variable = abs(q)
+                if variable in seen or self.levels[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.levels[variable] == level:
+                    pending += 1
+                else:
+                    learned.append(q)
+
+            # Walk back along the trail to the next marked literal
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reasons[abs(literal)]]
+
+        learned[0] = -literal
+
+        # Watch the literal from the highest remaining level second
+        backjump = 0
+        for k in range(1, len(learned)):
+            if self.levels[abs(learned[k])] > backjump:
+                backjump = self.levels[abs(learned[k])]
+                learned[1], learned[k] = learned[k], learned[1]
+        return learned, backjump
+
+    def bump(self, variable):
+        """Increases the activity of a variable involved in a conflict."""
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            for v in self.activity:
+                self.activity[v] *= 1e-100
+            self.increment *= 1e-100
+            self.order = [(-a, v) for v, a in self.activity.items()
+                          if v not in self.values]
+            heapq.heapify(self.order)
+
+    def backtrack(self, level):
+        """Undoes all assignments above the given decision level."""
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phases[variable] = literal > 0
+            del self.values[variable]
+            del self.levels[variable]
+            del self.reasons[variable]
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = start
+
+    def decide(self):
+        """Returns the next unassigned variable to branch on, if any."""
+        while self.order:
+            activity, variable = heapq.heappop(self.order)
+            if variable not in self.values and (
+                -activity == self.activity[variable]
+            ):
+                return variable
+        for variable in self.activity:
+            if variable not in self.values:
+                return variable
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Checks whether the clauses are satisfiable with every literal in
+        `assumptions` true. On success, `self.model` maps each variable to
+        its value. Learned clauses are kept for later calls.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        for literal in assumptions:
+            self.add_variable(abs(literal))
+
+        restart = 100
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.limits:
+                    self.ok = False
+                    return False
+
+                # Learn from the conflict and jump back
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.assign(learned[0], self.attach(learned))
+                self.increment *= 1.05
+                continue
+
+            # Restart from time to time, keeping learned clauses
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.backtrack(0)
+                continue
+
+            # Assumptions are decided first, one level each
+            level = len(self.limits)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                value = self.value(literal)
+                if value is False:
+                    self.backtrack(0)
+                    return False
+                self.limits.append(len(self.trail))
+                if value is None:
+                    self.assign(literal, None)
+                continue
+
+            variable = self.decide()
+            if variable is None:
+                self.model = dict(self.values)
+                self.backtrack(0)
+                return True
+            self.limits.append(len(self.trail))
+            phase = self.phases.get(variable, False)
+            self.assign(variable if phase else -variable, None)
+
+
+def sat_entails(knowledge, query):
+    """Checks if knowledge base entails query using the SAT solver."""
+    return KnowledgeBase(knowledge).ask(query)
+
+
+def sat_entails_all(knowledge, queries):
+    """Returns the queries that knowledge base entails, using the SAT solver."""
+    return KnowledgeBase(knowledge).entailed(queries)
+
+
+class KnowledgeBase():
+    """
+    Knowledge base backed by an incremental SAT solver.
+
+    Each added sentence is converted to clauses once and handed to a
+    single `Solver`, which keeps its learned clauses and heuristics
+    between queries. Queries and assumptions are defined by auxiliary
+    literals that are only assumed while solving, so asking again after
+    adding a fact only costs the new clauses.
+    """
+
+    def __init__(self, *sentences):
+        self.knowledge = And()
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.flushed = 0
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        self.knowledge.add(sentence)
+        self.cnf.add(sentence)
+        self.flush()
+
+    def flush(self):
+        """Hands clauses not yet seen by the solver over to it."""
+        for clause in self.cnf.clauses[self.flushed:]:
+            self.solver.add_clause(clause)
+        self.flushed = len(self.cnf.clauses)
+
+    def literal(self, sentence):
+        """Returns a solver literal equivalent to `sentence`."""
+        literal = self.cnf.define(sentence)
+        self.flush()
+        return literal
+
+    def consistent(self, assumptions=()):
+        """Checks if the knowledge base and assumptions have a model."""
+        literals = [self.literal(assumption) for assumption in assumptions]
+        return self.solver.solve(literals)
+
+    def ask(self, query, assumptions=()):
+        """
+        Checks if the knowledge base, together with the sentences in
+        `assumptions`, entails query.
+        """
+        literals = [self.literal(assumption) for assumption in assumptions]
+        return not self.solver.solve(literals + [-self.literal(query)])
+
+    def entailed(self, queries, assumptions=()):
+        """
+        Returns the queries that the knowledge base (with `assumptions`)
+        entails, by finding which of them belong to its backbone: the
+        literals true in all of its models.
+        """
+        queries = list(queries)
+        literals = [self.literal(query) for query in queries]
+        assumed = [self.literal(assumption) for assumption in assumptions]
+
+        # An inconsistent knowledge base entails everything
+        if not self.solver.solve(assumed):
+            return queries
+
+        # Only queries true in the first model can be entailed
+        def refuted(literal, model):
+            value = model.get(abs(literal))
+            return value is not None and value != (literal > 0)
+
+        candidates = {
+            literal for literal in literals
+            if not refuted(literal, self.solver.model)
+        }
+
+        # Each counter-model found also rules out every query false in it
+        entailed = set()
+        while candidates:
+            literal = candidates.pop()
+            if self.solver.solve(assumed + [-literal]):
+                candidates = {
+                    candidate for candidate in candidates
+                    if not refuted(candidate, self.solver.model)
+                }
+            else:
+                entailed.add(literal)
+
+        return [query for query, literal in zip(queries, literals)
+                if literal in entailed]
+
+
+class InferenceEngine():
+    """
+    Incremental inference over a store of clauses indexed by literal.
+
+    Sentences told to the engine are converted to clauses (see `CNF`).
+    Every unit clause becomes a fact that is resolved against the clauses
+    containing its negation (unit resolution, which is forward chaining
+    for Horn rules), and clauses satisfied by a fact or subsumed by
+    another clause are dropped. Queries are answered from the derived
+    facts and the index, without enumerating models.
+    """
+
+    def __init__(self):
+        self.cnf = CNF()
+        self.clauses = dict()
+        self.index = dict()
+        self.facts = set()
+        self.consistent = True
+        self.count = 0
+
+    def tell(self, sentence):
+        """Adds a sentence to the knowledge and derives its consequences."""
+        for clause in self.cnf.add(sentence):
+            self.add_clause(clause)
+
+    def add_clause(self, clause):
+        """Adds a clause to the store and propagates any new facts."""
+        queue = [frozenset(clause)]
+        while queue and self.consistent:
+            literals = queue.pop()
+
+            # Simplify the clause with the facts known so far
+            if any(literal in self.facts for literal in literals):
+                continue
+            literals = frozenset(
+                literal for literal in literals if -literal not in self.facts
+            )
+            if not literals:
+                self.consistent = False
+                return
+
+            # A unit clause is a new fact
+            if len(literals) == 1:
+                fact = next(iter(literals))
+                self.facts.add(fact)
+
+                # Clauses containing the fact are now satisfied
+                for number in list(self.index.get(fact, ())):
+                    self.remove(number)
+
+                # Clauses containing its negation lose that literal
+                for number in list(self.index.get(-fact, ())):
+                    queue.append(self.clauses[number] - {-fact})
+                    self.remove(number)
+                continue
+
+            # Keep only clauses that are not implied by another one
+            if self.subsumed(literals):
+                continue
+            for number in self.subsumed_by(literals):
+                self.remove(number)
+            self.store(literals)
+
+    def store(self, literals):
+        """Stores a clause and indexes it by each of its literals."""
+        self.count += 1
+        self.clauses[self.count] = literals
+        for literal in literals:
+            self.index.setdefault(literal, set()).add(self.count)
+
+    def remove(self, number):
+        """Removes a stored clause and its index entries."""
+        for literal in self.clauses.pop(number):
+            self.index[literal].discard(number)
+
+    def subsumed(self, literals):
+        """Checks if some stored clause is a subset of `literals`."""
+        return any(
+            self.clauses[number] <= literals
+            for literal in literals
+            for number in self.index.get(literal, ())
+        )
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+    def subsumed_by(self, literals):
+        """Returns the stored clauses that are supersets of `literals`."""
+        rarest = min(literals, key=lambda l: len(self.index.get(l, ())))
+        return [
+            number for number in self.index.get(rarest, ())
+            if literals <= self.clauses[number]
+        ]
+
+    def ask(self, query):
+        """
+        Checks if query follows from the knowledge by unit resolution.
+        The answer is always sound, and complete when the knowledge is a
+        set of Horn rules and the query is a conjunction of literals.
+        """
+        if not self.consistent:
+            return True
+        return all(
+            any(literal in self.facts for literal in clause)
+            or self.subsumed(clause)
+            for clause in self.query_clauses(query, True)
+        )
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    def query_clauses(self, sentence, positive):
+        """
+        Converts a (small) query to clauses over the engine's variables
+        by distributing disjunctions over conjunctions.
+        """
+        if isinstance(sentence, Symbol):
+            variable = self.cnf.variable(sentence.name)
+            return [frozenset([variable if positive else -variable])]
+        if isinstance(sentence, Not):
+            return self.query_clauses(sentence.operand, not positive)
+        if isinstance(sentence, And):
+            parts = [(conjunct, positive) for conjunct in sentence.conjuncts]
+            conjunctive = positive
+        elif isinstance(sentence, Or):
+            parts = [(disjunct, positive) for disjunct in sentence.disjuncts]
+            conjunctive = not positive
+        elif isinstance(sentence, Implication):
+            parts = [(sentence.antecedent, not positive),
+                     (sentence.consequent, positive)]
+            conjunctive = not positive
+        elif isinstance(sentence, Biconditional):
+            left, right = sentence.left, sentence.right
+            return (
+                self.query_clauses(Or(Not(left), right), True)
+                + self.query_clauses(Or(left, Not(right)), True)
+                if positive else
+                self.query_clauses(Or(left, right), True)
+                + self.query_clauses(Or(Not(left), Not(right)), True)
+            )
+        else:
+            raise TypeError("must be a logical sentence")
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+        # Conjunctions collect clauses, disjunctions multiply them out
+        if conjunctive:
+            return [clause for part in parts
+                    for clause in self.query_clauses(*part)]
+        clauses = [frozenset()]
+        for part in parts:
+            clauses = [
+                clause | other
+                for clause in clauses
+                for other in self.query_clauses(*part)
+                if not any(-literal in clause for literal in other)
+            ]
+        return clauses
+
+
+def truth_table(sentence, symbols):
+    """
+    Evaluates a sentence in every model of `symbols` at once.
+
+    Model number m assigns True to symbols[i] exactly when bit i of m is
+    set. Returns the truth values packed into an array of 64-bit words,
+    where bit b of word w holds the value in model 64 * w + b. Only the
+    lowest 2 ** len(symbols) bits are meaningful.
+    """
+    return Circuit([sentence]).truth_tables(symbols)[0]
+
+
+def vector_entails(knowledge, query):
+    """Checks if knowledge base entails query using packed truth tables."""
+    return bool(vector_entails_all(knowledge, [query]))
+
+
+def vector_entails_all(knowledge, queries):
+    """
+    Returns the queries that knowledge base entails, evaluating the
+    knowledge base's packed truth table once for all of them.
+    """
+    circuit = Circuit([knowledge] + queries)
+    symbols = sorted(circuit.symbols)
+
+    # Count only the models that exist when there are fewer than 64
+    valid = ~np.uint64(0)
+    if len(symbols) < 6:
+        valid = np.uint64(2 ** (2 ** len(symbols)) - 1)
+
+    # Entailment fails if some model makes knowledge true and query false
+    refuted = [False] * len(queries)
+    for models, *columns in circuit.truth_table_blocks(symbols):
+        models = models & valid
+        for i, column in enumerate(columns):
+            if not refuted[i] and (models & ~column).any():
+                refuted[i] = True
+    return [query for query, wrong in zip(queries, refuted) if not wrong]
+
+
+# Operators of the formula syntax, with ASCII alternatives
+OPERATORS = {
+    "¬": "¬", "~": "¬",
+    "∧": "∧", "&": "∧",
+    "∨": "∨", "|": "∨",
+    "=>": "=>", "->": "=>",
+    "<=>": "<=>", "<->": "<=>"
+}
+
+# Binding strength of operators, tightest first
+PRECEDENCE = {"¬": 5, "∧": 4, "∨": 3, "=>": 2, "<=>": 1}
+
+TOKENS = re.compile(r"(<=>|<->|=>|->|[()¬~∧&∨|])")
+
+
+def parse_formula(text):
+    """
+    Parses a sentence written in the syntax produced by `formula()`.
+
+    Symbol names are the text between operators and parentheses, with
+    surrounding whitespace removed. Without parentheses, ¬ binds tightest,
+    then ∧, ∨, => (right associative) and <=>. Chains of ∧ or ∨ become a
+    single And or Or. Parsing uses explicit stacks, so deeply nested
+    formulas are not limited by the recursion limit.
+    """
+    operands = []
+    operators = []
+
+    def reduce():
+        """Replaces the top operator and its operands with a sentence."""
+        operator, arity = operators.pop()
+        if len(operands) < arity:
+            raise ValueError(f"malformed formula: {text!r}")
+        arguments = operands[len(operands) - arity:]
+        del operands[len(operands) - arity:]
+        if operator == "¬":
+            operands.append(Not(*arguments))
+        elif operator == "∧":
+            operands.append(And(*arguments))
+        elif operator == "∨":
+            operands.append(Or(*arguments))
+        elif operator == "=>":
+            operands.append(Implication(*arguments))
+        else:
+            operands.append(Biconditional(*arguments))
+
+    expect_operand = True
+    for token in TOKENS.split(text):
+        token = token.strip()
+        if not token:
+            continue
+        operator = OPERATORS.get(token)
+
+        if token == "(" or operator == "¬":
+            if not expect_operand:
+                raise ValueError(f"malformed formula: {text!r}")
+            operators.append(("(", 0) if token == "(" else ("¬", 1))
+
+        elif token == ")":
+            if expect_operand:
+                raise ValueError(f"malformed formula: {text!r}")
+            while operators and operators[-1][0] != "(":
+                reduce()
+            if not operators:
+                raise ValueError(f"unbalanced parentheses: {text!r}")
+            operators.pop()
+            expect_operand = False
+
+        elif operator is not None:
+            if expect_operand:
+                raise ValueError(f"malformed formula: {text!r}")
+
+            # Apply tighter operators first; only => groups to the right
+            while operators and operators[-1][0] != "(" and (
+                PRECEDENCE[operators[-1][0]] > PRECEDENCE[operator]
+                or operators[-1][0] == operator == "<=>"
+            ):
+                reduce()
+
+            # Extend a chain of the same associative operator
+            if operator in ("∧", "∨") and operators and (
+                operators[-1][0] == operator
+            ):
+                operators[-1] = (operator, operators[-1][1] + 1)
+            else:
+                operators.append((operator, 2))
+            expect_operand = True
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+        else:
+            if not expect_operand:
+                raise ValueError(f"malformed formula: {text!r}")
+            operands.append(Symbol(token))
+            expect_operand = False
+
+    # An empty formula is an empty conjunction, as `formula()` prints it
+    if not operands and not operators:
+        return And()
+    if expect_operand:
+        raise ValueError(f"malformed formula: {text!r}")
+    while operators:
+        if operators[-1][0] == "(":
+            raise ValueError(f"unbalanced parentheses: {text!r}")
+        reduce()
+    if len(operands) != 1:
+        raise ValueError(f"malformed formula: {text!r}")
+    return operands[0]
+
+
+def read_formulas(file):
+    """
+    Reads sentences from an open text file, one formula per line,
+    skipping blank lines and lines starting with #.
+    """
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield parse_formula(line)
+
+
+def write_formulas(sentences, file):
+    """Writes sentences to an open text file, one formula per line."""
+    for sentence in sentences:
+        file.write(sentence.formula() + "\n")
+
+
+def read_dimacs_clauses(file):
+    """
+    Reads a DIMACS CNF file from an open text file. Returns the number
+    of variables, the clauses as lists of integers, and the symbol names
+    recorded in "c symbol <variable> <name>" comments.
+    """
+    variables = 0
+    clauses = []
+    names = dict()
+    clause = []
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] == "c":
+            parts = line.split(None, 3)
+            if len(parts) == 4 and parts[1] == "symbol":
+                names[int(parts[2])] = parts[3]
+            continue
+        if line[0] == "p":
+            variables = int(line.split()[2])
+            continue
+        if line[0] == "%":
+            break
+
+        # Clauses end with 0 and may span several lines
+        for literal in map(int, line.split()):
+            if literal:
+                clause.append(literal)
+                variables = max(variables, abs(literal))
+            else:
+                clauses.append(clause)
+                clause = []
+    if clause:
+        clauses.append(clause)
+    return variables, clauses, names
+
+
+def read_dimacs(file):
+    """
+    Reads a DIMACS CNF file from an open text file as a conjunction of
+    disjunctions. Variables without a recorded name are named by number.
+    """
+    variables, clauses, names = read_dimacs_clauses(file)
+    symbols = [None] + [
+        Symbol(names.get(variable, str(variable)))
+        for variable in range(1, variables + 1)
+    ]
+    negations = [None] + [Not(symbol) for symbol in symbols[1:]]
+    return And(*[
+        Or(*[symbols[l] if l > 0 else negations[-l] for l in clause])
+        for clause in clauses
+    ])
+
+
+def write_dimacs(knowledge, file):
+    """
+    Writes a sentence to an open text file in DIMACS CNF format, using
+    the encoding of `CNF`. Symbol names are kept in comments so that
+    `read_dimacs` restores them.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    for variable, name in enumerate(cnf.names):
+        if name is not None:
+            file.write(f"c symbol {variable} {name}\n")
+    file.write(f"p cnf {len(cnf.names) - 1} {len(cnf.clauses)}\n")
+    for clause in cnf.clauses:
+        file.write(" ".join(map(str, clause)) + " 0\n")
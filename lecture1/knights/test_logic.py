@@ -0,0 +1,85 @@
+import pytest
+
+import logic
+from logic import *
+
+A = Symbol("A")
+B = Symbol("B")
+C = Symbol("C")
+
+
+def test_identical_knowledge_bases_stay_independent():
+    knowledge1 = And(A, B)
+    knowledge2 = And(A, B)
+    knowledge1.add(C)
+    assert knowledge1 is not knowledge2
+    assert knowledge1.conjuncts == [A, B, C]
+    assert knowledge2.conjuncts == [A, B]
+
+
+def test_growing_a_sentence_updates_its_cached_values():
+    conjunction = And(A, B)
+    assert conjunction.formula() == "A ∧ B"
+    before = hash(conjunction)
+    conjunction.add(C)
+    assert conjunction.formula() == "A ∧ B ∧ C"
+    assert conjunction.symbols() == {"A", "B", "C"}
+    assert hash(conjunction) != before
+    assert hash(conjunction) == hash(And(A, B, C))
+
+
+def test_sentences_used_as_operands_cannot_grow():
+    conjunction = And(A, B)
+    negation = Not(conjunction)
+    with pytest.raises(ValueError):
+        conjunction.add(C)
+    assert negation.formula() == "¬(A ∧ B)"
+
+
+def test_repeated_sentences_are_shared():
+    assert Not(A) is Not(A)
+    assert Implication(A, Not(B)) is Implication(A, Not(B))
+    assert Or(And(A, B), And(Not(A), C)) is Or(And(A, B), And(Not(A), C))
+    assert Not(And(A, B)).operand is Implication(And(A, B), C).antecedent
+
+
+def test_puzzle_shares_repeated_sub_sentences():
+    import puzzle
+    statement = puzzle.knowledge2.conjuncts[4].antecedent
+    negated = puzzle.knowledge2.conjuncts[5].antecedent.operand
+    assert statement == Or(And(puzzle.AKnave, puzzle.BKnave),
+                          And(puzzle.AKnight, puzzle.BKnight))
+    assert statement is negated
+
+
+def test_deep_knowledge_base():
+    knowledge = A
+    for _ in range(5000):
+        knowledge = Not(Not(knowledge))
+    for method in ("enumerate", "vector", "sat"):
+        assert model_check(knowledge, A, method)
+        assert not model_check(knowledge, B, method)
+
+    chain = A
+    for i in range(5000):
+        chain = And(chain, Symbol(f"S{i % 10}"))
+    circuit = Circuit([chain])
+    assert len(circuit.nodes) == 5000 + 11
+    assert sorted(circuit.symbols) == sorted(
+        ["A"] + [f"S{i}" for i in range(10)])
+    assert model_check(chain, Symbol("S3"))
+
+
+def test_truth_tables_agree_across_blocks(monkeypatch):
+    names = [f"X{i}" for i in range(10)]
+    X = [Symbol(name) for name in names]
+    sentence = And(Or(X[9], Not(X[2])), Biconditional(X[8], X[0]),
+                   Implication(X[6], X[7]))
+    whole = truth_table(sentence, names)
+    monkeypatch.setattr(logic, "BLOCK_WORDS", 3)
+    blocks = truth_table(sentence, names)
+    assert (whole == blocks).all()
+    for m in range(2 ** len(names)):
+        model = {name: bool(m >> i & 1) for i, name in enumerate(names)}
+        value = bool(int(blocks[m // 64]) >> (m % 64) & 1)
+        assert value == sentence.evaluate(model)
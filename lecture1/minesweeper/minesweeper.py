@@ -1,6 +1,19 @@
+import math
 import random
+import time
+from collections import deque
 from itertools import product
 
+import numpy as np
+
+# Components with more cells than this are sampled rather than enumerated
+SAMPLE_CELLS = 48
+
+# Most randomized searches per sampled component, and the steps each may
+# take per cell before it is restarted
+SAMPLE_RESTARTS = 256
+SAMPLE_STEPS = 20
+
 
 class Minesweeper():
     """
@@ -77,6 +90,31 @@ class Minesweeper():
 
         return count
 
+    def reveal(self, cell, revealed=()):
+        """
+        Reveals a safe cell and, if none of its neighbors are mines,
+        keeps revealing around it as far as the region of zeros reaches.
+
+        Returns a dictionary mapping each newly revealed cell to
+        its number of nearby mines. Cells in `revealed` are skipped.
+        """
+        counts = dict()
+        frontier = [cell]
+        while frontier:
+            cell = frontier.pop()
+            if cell in counts or cell in revealed:
+                continue
+            counts[cell] = self.nearby_mines(cell)
+
+            # Every neighbor of a zero is safe, so reveal them too
+            if counts[cell] == 0:
+                for i in range(cell[0] - 1, cell[0] + 2):
+                    for j in range(cell[1] - 1, cell[1] + 2):
+                        if 0 <= i < self.height and 0 <= j < self.width:
+                            frontier.append((i, j))
+
+        return counts
+
     def won(self):
         """
         Checks if all mines have been flagged.
@@ -84,6 +122,47 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+class ArrayMinesweeper(Minesweeper):
+    """
+    Minesweeper game stored in NumPy arrays, for very large boards
+    """
+
+    def __init__(self, height=8, width=8, mines=8, seed=None):
+
+        # Set initial width, height, and number of mines
+        self.height = height
+        self.width = width
+
+        # Place every mine at once with a random permutation of the cells
+        rng = np.random.default_rng(seed)
+        board = np.zeros(height * width, dtype=bool)
+        board[rng.permutation(height * width)[:mines]] = True
+        self.board = board.reshape(height, width)
+        rows, columns = np.nonzero(self.board)
+        self.mines = set(zip(rows.tolist(), columns.tolist()))
+
+        # Count nearby mines for every cell by adding up shifted boards
+        padded = np.pad(self.board, 1).astype(np.uint8)
+        self.counts = np.zeros((height, width), dtype=np.uint8)
+        for i, j in product(range(3), repeat=2):
+            if (i, j) != (1, 1):
+                self.counts += padded[i:i + height, j:j + width]
+
+        # At first, player has found no mines
+        self.mines_found = set()
+
+    def is_mine(self, cell):
+        return bool(self.board[cell])
+
+    def nearby_mines(self, cell):
+        """
+        Returns the number of mines that are
+        within one row and column of a given cell,
+        not including the cell itself.
+        """
+        return int(self.counts[cell])
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
@@ -131,17 +210,70 @@ class Sentence():
             self.cells.remove(cell)
 
 
+class FrozenSentence():
+    """
+    Immutable, hashable version of a Sentence, used by the AI's
+    knowledge store so that duplicate sentences are found in O(1)
+    """
+
+    __slots__ = ("cells", "count", "hash")
+
+    def __init__(self, cells, count):
+        self.cells = frozenset(cells)
+        self.count = count
+        self.hash = hash((self.cells, count))
+
+    def __eq__(self, other):
+        return self.cells == other.cells and self.count == other.count
+
+    def __hash__(self):
+        return self.hash
+
+    def __str__(self):
+        return f"{set(self.cells)} = {self.count}"
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        return self.cells if len(self.cells) == self.count else frozenset()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        return self.cells if self.count == 0 else frozenset()
+
+    def without_mine(self, cell):
+        """
+        Returns the sentence that remains once `cell` is known to be a mine.
+        """
+        return FrozenSentence(self.cells - {cell}, self.count - 1)
+
+    def without_safe(self, cell):
+        """
+        Returns the sentence that remains once `cell` is known to be safe.
+        """
+        return FrozenSentence(self.cells - {cell}, self.count)
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, time_budget=1.0):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known
+        self.total_mines = mines
+
+        # Seconds a guess may spend weighing up the possibilities
+        self.time_budget = time_budget
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -149,8 +281,47 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Safe cells that have not been clicked on yet, and the order in
+        # which they were found (possibly including cells played since)
+        self.safe_moves = set()
+        self.safe_queue = deque()
+
+        # Set of sentences about the game known to be true
+        self.knowledge = set()
+
+        # Map each cell to the sentences containing it
+        self.index = dict()
+
+        # Sentences added since inference last looked at them
+        self.pending = set()
+
+        # Exact solution counts of components, keyed by their sentences
+        # (None if they could not be counted in time)
+        self.solutions = dict()
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base, indexes it
+        by each of its cells and queues it for inference.
+        Returns False if the sentence was already known.
+        """
+        if sentence in self.knowledge:
+            return False
+        self.knowledge.add(sentence)
+        for cell in sentence.cells:
+            self.index.setdefault(cell, set()).add(sentence)
+        self.pending.add(sentence)
+        return True
+
+    def remove_sentence(self, sentence):
+        """
+        Removes a sentence from the knowledge base and from the index.
+        """
+        self.knowledge.discard(sentence)
+        self.pending.discard(sentence)
+        for cell in sentence.cells:
+            if cell in self.index:
+                self.index[cell].discard(sentence)
 
     def mark_mine(self, cell):
         """
@@ -158,8 +329,9 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        for sentence in self.index.pop(cell, set()):
+            self.remove_sentence(sentence)
+            self.add_sentence(sentence.without_mine(cell))
 
     def mark_safe(self, cell):
         """
@@ -167,8 +339,50 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        if cell not in self.moves_made and cell not in self.safe_moves:
+            self.safe_moves.add(cell)
+            self.safe_queue.append(cell)
+        for sentence in self.index.pop(cell, set()):
+            self.remove_sentence(sentence)
+            self.add_sentence(sentence.without_safe(cell))
+
+    def infer(self):
+        """
+        Draws every conclusion that follows from the pending sentences,
+        revisiting only sentences that change along the way.
+        """
+        while self.pending:
+            sentence = self.pending.pop()
+
+            # Sentences with known cells are used up by marking them
+            safes = sentence.known_safes()
+            mines = sentence.known_mines()
+            if not sentence.cells or safes or mines:
+                self.remove_sentence(sentence)
+                for cell in safes:
+                    self.mark_safe(cell)
+                for cell in mines:
+                    self.mark_mine(cell)
+                continue
+
+            # Only sentences sharing a cell can be subsets of each other
+            neighbors = set()
+            for cell in sentence.cells:
+                neighbors |= self.index[cell]
+            neighbors.discard(sentence)
+
+            for other in neighbors:
+                # Infer a new sentence using the subset method
+                if sentence.cells < other.cells:
+                    self.add_sentence(FrozenSentence(
+                        other.cells - sentence.cells,
+                        other.count - sentence.count
+                    ))
+                elif other.cells < sentence.cells:
+                    self.add_sentence(FrozenSentence(
+                        sentence.cells - other.cells,
+                        sentence.count - other.count
+                    ))
 
     def add_knowledge(self, cell, count):
         """
@@ -185,8 +399,37 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        # 1), 2) and 3)
+        self.observe(cell, count)
+
+        # 4) and 5)
+        self.conclude()
+
+    def add_knowledge_many(self, cells_and_counts):
+        """
+        Adds several observations at once, given as (cell, count)
+        pairs or as a dictionary, then draws conclusions only once.
+        """
+        observations = dict(cells_and_counts)
+
+        # Mark every cell first, so that new sentences leave them out
+        for cell in observations:
+            self.moves_made.add(cell)
+            self.safe_moves.discard(cell)
+            self.mark_safe(cell)
+
+        for cell, count in observations.items():
+            self.observe(cell, count)
+        self.conclude()
+
+    def observe(self, cell, count):
+        """
+        Records a move and the number of mines around it,
+        without drawing any conclusions yet.
+        """
         # 1)
         self.moves_made.add(cell)
+        self.safe_moves.discard(cell)
         
         # 2)
         self.mark_safe(cell)
@@ -210,42 +453,62 @@ class MinesweeperAI():
         
         # If possible, add a new sentence to knowledge base
         if cells:
-            self.knowledge.append(Sentence(cells, count))
-        
-        # While there are possible changes to KB
-        changes = True
-        while changes:
-            changes = False
-            # 4)
-            # Iterate over sentences in KB
-            for sentence in self.knowledge:
-                # Initialize sets with known mines and safes (if exist) for sentence
-                safes = sentence.known_safes().copy()
-                mines = sentence.known_mines().copy()
-                
-                # If there are safes, mark them and remove the sentence from KB
-                if safes:
-                    for cell in safes:
-                        self.mark_safe(cell)
-                    self.knowledge.remove(sentence)
-                    changes = True
-                # If there are mines, mark them and remove the sentence from KB
-                elif mines:
-                    for cell in mines:
-                        self.mark_mine(cell)
-                    self.knowledge.remove(sentence)
-                    changes = True
-            
-            # 5)
-            # Iterate over sentences in KB
-            for sentence1 in self.knowledge:
-                for sentence2 in self.knowledge:
-                    # If possible, infer a new sentence and add it to KB using the subset method 
-                    if sentence1.cells < sentence2.cells:
-                        new_sentence = Sentence(sentence2.cells - sentence1.cells, sentence2.count - sentence1.count)
-                        if new_sentence not in self.knowledge:
-                            self.knowledge.append(new_sentence)
-                            changes = True
+            self.add_sentence(FrozenSentence(cells, count))
+
+    def conclude(self):
+        """
+        Marks every cell that follows from the knowledge
+        as safe or as a mine.
+        """
+        # Work through the new sentences and everything they change
+        self.infer()
+
+        # When the subset method stalls, solve components exactly,
+        # within one time budget for the whole move
+        deadline = time.perf_counter() + self.time_budget
+        while self.solve(deadline):
+            self.infer()
+
+    def solve(self, deadline):
+        """
+        Marks every cell that is safe in all solutions of its component,
+        or a mine in all of them, counting new components only until
+        `deadline`. Returns True if any cell was marked.
+        """
+        safes = []
+        mines = []
+        current = dict()
+        for cells, sentences in self.components():
+            key = frozenset(sentences)
+
+            # Reuse counts of components that have not changed
+            if key in self.solutions:
+                current[key] = self.solutions[key]
+            elif len(cells) <= SAMPLE_CELLS and time.perf_counter() < deadline:
+                result = self.count_solutions(cells, sentences, deadline)
+                current[key] = result if result[3] else None
+            if current.get(key) is None:
+                continue
+
+            cells, totals, counts, _ = current[key]
+            total = sum(totals.values())
+            if not total:
+                continue
+            for c, cell in enumerate(cells):
+                count = sum(row[c] for row in counts.values())
+                if count == 0:
+                    safes.append(cell)
+                elif count == total:
+                    mines.append(cell)
+
+        # Forget components that have changed since
+        self.solutions = current
+
+        for cell in safes:
+            self.mark_safe(cell)
+        for cell in mines:
+            self.mark_mine(cell)
+        return bool(safes or mines)
 
     def make_safe_move(self):
         """
@@ -256,20 +519,365 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for cell in self.safes:
-            if cell not in self.moves_made:
+        # Skip cells that have been played since they were found safe
+        while self.safe_queue:
+            cell = self.safe_queue[0]
+            if cell in self.safe_moves:
                 return cell
+            self.safe_queue.popleft()
 
         return None
 
+    def make_safe_moves(self):
+        """
+        Returns every cell known to be safe that has not been chosen yet.
+        """
+        return set(self.safe_moves)
+
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        Picks the cell least likely to be a mine, breaking ties at random.
         """
-        moves = set(product(range(self.height), range(self.width)))
-        possible = list(moves - self.moves_made - self.mines)
-        
-        return random.choice(possible) if possible else None
+        # A known safe cell is always the best guess
+        cell = self.make_safe_move()
+        if cell is not None:
+            return cell
+
+        probabilities, other = self.mine_probabilities()
+        lowest = min(probabilities.values(), default=1)
+        if other is not None and other <= lowest:
+            return self.random_other_cell()
+        if not probabilities:
+            return None
+        return random.choice([
+            cell for cell, probability in probabilities.items()
+            if probability <= lowest + 1e-12
+        ])
+
+    def random_other_cell(self):
+        """
+        Returns a random cell about which nothing is known.
+        """
+        def unknown(cell):
+            return (cell not in self.moves_made and cell not in self.mines
+                    and cell not in self.safes and cell not in self.index)
+
+        # Try random cells first, as most of a large board is unknown
+        for _ in range(100):
+            cell = (random.randrange(self.height), random.randrange(self.width))
+            if unknown(cell):
+                return cell
+        cells = [cell for cell in product(range(self.height), range(self.width))
+                 if unknown(cell)]
+        return random.choice(cells) if cells else None
+
+    def components(self):
+        """
+        Splits the knowledge into groups of sentences that share no cells
+        with other groups. Returns a list of (cells, sentences) pairs.
+        """
+        parent = dict()
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        # Join the cells of each sentence into one set
+        for sentence in self.knowledge:
+            cells = iter(sentence.cells)
+            first = next(cells)
+            parent.setdefault(first, first)
+            for cell in cells:
+                parent.setdefault(cell, cell)
+                parent[find(cell)] = find(first)
+
+        groups = dict()
+        for sentence in self.knowledge:
+            root = find(next(iter(sentence.cells)))
+            groups.setdefault(root, []).append(sentence)
+        components = []
+        for sentences in groups.values():
+            cells = set()
+            for sentence in sentences:
+                cells |= sentence.cells
+            components.append((cells, sentences))
+        return components
+
+    def count_solutions(self, cells, sentences, deadline, sample=False):
+        """
+        Counts the ways of placing mines in `cells` that agree with every
+        sentence, grouped by number of mines.
+
+        Returns (cells, totals, mines, exact): `cells` in search order,
+        `totals[k]` the number of solutions with k mines, `mines[k][i]`
+        how many of those put a mine in cells[i], and whether the counts
+        are exact. If the deadline passes, or `sample` is True, solutions
+        are instead sampled by restarting a randomized search until the
+        deadline or SAMPLE_RESTARTS searches.
+        """
+        # Index the sentences containing each cell
+        constraints = dict()
+        for j, sentence in enumerate(sentences):
+            for cell in sentence.cells:
+                constraints.setdefault(cell, []).append(j)
+
+        # Order cells breadth-first through shared sentences, starting in
+        # the smallest sentence, so that sentences are completed early
+        starts = sorted(cells, key=lambda c: (min(
+            len(sentences[j].cells) for j in constraints[c]
+        ), c))
+        order = []
+        seen = set()
+        for start in starts:
+            if start in seen:
+                continue
+            seen.add(start)
+            order.append(start)
+            i = len(order) - 1
+            while i < len(order):
+                for j in constraints[order[i]]:
+                    for other in sorted(sentences[j].cells):
+                        if other not in seen:
+                            seen.add(other)
+                            order.append(other)
+                i += 1
+        cells = order
+        constraints = [constraints[cell] for cell in cells]
+
+        # Track mines placed and cells left for every sentence
+        counts = [sentence.count for sentence in sentences]
+        left = [len(sentence.cells) for sentence in sentences]
+        placed = [0] * len(sentences)
+
+        totals = dict()
+        mines = dict()
+
+        def undo(i, value):
+            """Takes back the value assigned to cells[i]."""
+            for j in constraints[i]:
+                placed[j] -= value
+                left[j] += 1
+
+        def search(randomize, limit):
+            """
+            Searches depth-first, with an explicit stack, trying 0 then 1
+            for each cell (or a random value first, if `randomize`).
+            Records every solution, or only the first one if sampling.
+            Returns False if the search gave up after `limit` steps.
+            """
+            n = len(cells)
+
+            # Values tried so far, value tried first and value assigned
+            # for each cell on the stack
+            tried = [0] * n
+            first = [0] * n
+            assigned = [None] * n
+            if randomize:
+                first[0] = random.randrange(2)
+            i = 0
+            k = 0
+            mask = 0
+            steps = 0
+            while i >= 0:
+                steps += 1
+                if steps % 1024 == 0 and time.perf_counter() > deadline:
+                    raise TimeoutError
+
+                # Take back the value last tried for this cell
+                value = assigned[i]
+                if value is not None:
+                    undo(i, value)
+                    k -= value
+                    mask &= ~(value << i)
+                    assigned[i] = None
+
+                # Give up, or backtrack once both values have been tried
+                if steps > limit:
+                    for h in range(i - 1, -1, -1):
+                        undo(h, assigned[h])
+                    return False
+                if tried[i] == 2:
+                    i -= 1
+                    continue
+
+                value = first[i] if tried[i] == 0 else 1 - first[i]
+                tried[i] += 1
+                feasible = True
+                for j in constraints[i]:
+                    placed[j] += value
+                    left[j] -= 1
+                    if placed[j] > counts[j] or placed[j] + left[j] < counts[j]:
+                        feasible = False
+                if not feasible:
+                    undo(i, value)
+                    continue
+                assigned[i] = value
+                k += value
+                mask |= value << i
+
+                if i + 1 < n:
+                    i += 1
+                    tried[i] = 0
+                    if randomize:
+                        first[i] = random.randrange(2)
+                    continue
+
+                # Every cell is assigned, so this is a solution
+                totals[k] = totals.get(k, 0) + 1
+                row = mines.setdefault(k, [0] * n)
+                bits = mask
+                while bits:
+                    bit = bits & -bits
+                    row[bit.bit_length() - 1] += 1
+                    bits ^= bit
+                if sample:
+                    for h in range(i, -1, -1):
+                        undo(h, assigned[h])
+                    return True
+            return True
+
+        # Enumerate every solution, unless that takes too long
+        if not sample:
+            try:
+                search(False, math.inf)
+                return cells, totals, mines, True
+            except TimeoutError:
+                totals.clear()
+                mines.clear()
+                placed[:] = [0] * len(sentences)
+                left[:] = [len(sentence.cells) for sentence in sentences]
+                sample = True
+
+        # Otherwise collect solutions from randomized searches, each
+        # restarted from scratch if it has to backtrack too much
+        for _ in range(SAMPLE_RESTARTS):
+            try:
+                search(True, SAMPLE_STEPS * len(cells))
+            except TimeoutError:
+                break
+            if time.perf_counter() > deadline:
+                break
+        return cells, totals, mines, False
+
+    def mine_probabilities(self):
+        """
+        Works out how likely each undetermined cell is to be a mine.
+
+        Returns a dictionary with the probability for each cell appearing
+        in the knowledge, and the probability shared by every other
+        unknown cell (None if there are no such cells). Solutions of each
+        component are weighted by the number of ways to place the
+        remaining mines in the other cells.
+        """
+        deadline = time.perf_counter() + self.time_budget
+        components = sorted(self.components(), key=lambda c: len(c[0]))
+
+        # Exactly count small components first, leaving time for the rest
+        results = []
+        probabilities = dict()
+        for i, (cells, sentences) in enumerate(components):
+            share = (deadline - time.perf_counter()) / (len(components) - i)
+            cached = self.solutions.get(frozenset(sentences))
+            if cached is not None:
+                cells, totals, mines, _ = cached
+            else:
+                cells, totals, mines, _ = self.count_solutions(
+                    cells, sentences, time.perf_counter() + share,
+                    sample=len(cells) > SAMPLE_CELLS
+                )
+
+            # Without any solution found, fall back to the sentence densities
+            if not totals:
+                density = sum(s.count / len(s.cells) for s in sentences)
+                for cell in cells:
+                    probabilities[cell] = density / len(sentences)
+                continue
+
+            # Scale counts down, which leaves every ratio unchanged
+            top = max(totals.values())
+            results.append((
+                cells,
+                {k: ways / top for k, ways in totals.items()},
+                {k: [n / top for n in row] for k, row in mines.items()}
+            ))
+
+        # Cells outside the knowledge are all alike
+        frontier = sum(len(cells) for cells, _ in components)
+        others = (self.height * self.width - len(self.mines)
+                  - len(self.safes | self.moves_made) - frontier)
+        remaining = None
+        if self.total_mines is not None:
+            remaining = self.total_mines - len(self.mines)
+
+        # Ways to place k mines in all components except one
+        def convolve(a, b):
+            c = dict()
+            for i, x in a.items():
+                for j, y in b.items():
+                    c[i + j] = c.get(i + j, 0) + x * y
+            return c
+
+        prefixes = [{0: 1}]
+        for _, totals, _ in results:
+            prefixes.append(convolve(prefixes[-1], totals))
+        suffixes = [{0: 1}]
+        for _, totals, _ in reversed(results):
+            suffixes.append(convolve(suffixes[-1], totals))
+        suffixes.reverse()
+        everything = prefixes[-1]
+
+        # Relative number of ways to place the other mines outside, for
+        # each number of mines in the frontier
+        scale = dict()
+        if remaining is not None:
+            logs = {
+                k: log_comb(others, remaining - k) for k in everything
+                if 0 <= remaining - k <= others
+            }
+            top = max(logs.values(), default=0)
+            scale = {k: math.exp(log - top) for k, log in logs.items()}
+
+        # If the mine count cannot be matched, ignore it rather than fail
+        if not scale:
+            remaining = None
+
+        def weight(k):
+            return 1 if remaining is None else scale.get(k, 0)
+
+        for i, (cells, totals, mines) in enumerate(results):
+            rest = convolve(prefixes[i], suffixes[i + 1])
+            weights = {
+                k: sum(ways * weight(k + j) for j, ways in rest.items())
+                for k in totals
+            }
+            total = sum(totals[k] * weights[k] for k in totals)
+            for c, cell in enumerate(cells):
+                probabilities[cell] = sum(
+                    mines[k][c] * weights[k] for k in totals
+                ) / total if total else 0.5
+
+        # Other cells share the mines not expected in the frontier
+        other = None
+        if others > 0:
+            if remaining is None:
+                other = (sum(probabilities.values()) / len(probabilities)
+                         if probabilities else 0.5)
+            else:
+                total = sum(ways * weight(k) for k, ways in everything.items())
+                expected = sum(ways * weight(k) * (remaining - k)
+                               for k, ways in everything.items())
+                other = expected / total / others
+        return probabilities, other
+
+
+def log_comb(n, k):
+    """
+    Returns the natural logarithm of the binomial coefficient C(n, k).
+    """
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
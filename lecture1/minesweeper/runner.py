@@ -1,6 +1,7 @@
 import pygame
+import queue
 import sys
-import time
+import threading
 
 from minesweeper import Minesweeper, MinesweeperAI
 
@@ -56,29 +57,152 @@ flag = pygame.transform.scale(flag, (cell_size, cell_size))
 mine = pygame.image.load("assets/images/mine.png")
 mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
-# Create game and AI agent
+# Pre-render everything drawn on the board
+tile = pygame.Surface((cell_size, cell_size))
+pygame.draw.rect(tile, GRAY, tile.get_rect())
+pygame.draw.rect(tile, WHITE, tile.get_rect(), 3)
+numbers = {
+    count: smallFont.render(str(count), True, NUM_COLORS[str(count)])
+    for count in range(9)
+}
+labels = {
+    text: mediumFont.render(text, True, BLACK)
+    for text in ["AI Move", "AI Play", "AI Stop", "Reset"]
+}
+results = {
+    text: mediumFont.render(text, True, WHITE)
+    for text in ["Lost", "Won", ""]
+}
+
+# Board cells and side panel
+cells = [
+    [
+        pygame.Rect(
+            board_origin[0] + j * cell_size,
+            board_origin[1] + i * cell_size,
+            cell_size, cell_size
+        )
+        for j in range(WIDTH)
+    ]
+    for i in range(HEIGHT)
+]
+every_cell = {(i, j) for i in range(HEIGHT) for j in range(WIDTH)}
+panel = pygame.Rect((2 / 3) * width, 0, width / 3, height)
+
+# Buttons
+aiButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+resetButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+playButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 90,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+
+FPS = 60
+
+# Create game
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+
+# Games are numbered, so that late AI moves for an old game are ignored
+game_number = 0
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
 flags = set()
 lost = False
 
+# Cells that have changed since they were last drawn
+dirty = set(every_cell)
+
+# Whether the AI keeps making moves by itself, and whether it has been
+# asked for a move it has not made yet
+playing = False
+thinking = False
+
+# Requests for the AI, and the moves it makes
+requests = queue.Queue()
+replies = queue.Queue()
+
+
+def run_ai():
+    """
+    Runs the AI agent on its own thread, so that the board keeps being
+    drawn while the AI thinks.
+
+    Handles requests in order: ("learn", counts) adds knowledge,
+    ("move", number) replies with (number, move, safe, mines) and
+    ("reset", None) starts a new AI agent.
+    """
+    ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
+    while True:
+        request, argument = requests.get()
+        if request == "learn":
+            ai.add_knowledge_many(argument)
+        elif request == "move":
+            move = ai.make_safe_move()
+            safe = move is not None
+            if not safe:
+                move = ai.make_random_move()
+            replies.put((argument, move, safe, ai.mines.copy()))
+        elif request == "reset":
+            ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
+
+
+threading.Thread(target=run_ai, daemon=True).start()
+
+
+def cell_at(position):
+    """
+    Returns the board cell at a screen position, or None.
+    """
+    i = (position[1] - board_origin[1]) // cell_size
+    j = (position[0] - board_origin[0]) // cell_size
+    if 0 <= i < HEIGHT and 0 <= j < WIDTH:
+        return (i, j)
+    return None
+
+
+def make_move(move):
+    """
+    Makes a move and updates AI knowledge.
+    Returns True if the move hit a mine.
+    """
+    if game.is_mine(move):
+        dirty.update(game.mines)
+        return True
+    counts = game.reveal(move, revealed)
+    revealed.update(counts)
+    dirty.update(counts)
+
+    # Revealed cells can no longer be flagged
+    flags.difference_update(counts)
+    requests.put(("learn", counts))
+    return False
+
+
 # Show instructions initially
 instructions = True
 
+clock = pygame.time.Clock()
 while True:
+    clock.tick(FPS)
 
-    # Check if game quit
+    # Check if game quit, and collect clicks
+    clicks = []
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             sys.exit()
-
-    screen.fill(BLACK)
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            clicks.append((event.button, event.pos))
 
     # Show game instructions
     if instructions:
+        screen.fill(BLACK)
 
         # Title
         title = largeFont.render("Play Minesweeper", True, WHITE)
@@ -107,136 +231,124 @@ while True:
         screen.blit(buttonText, buttonTextRect)
 
         # Check if play button clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if buttonRect.collidepoint(mouse):
+        for button, mouse in clicks:
+            if button == 1 and buttonRect.collidepoint(mouse):
                 instructions = False
-                time.sleep(0.2)
+                screen.fill(BLACK)
 
         pygame.display.flip()
         continue
 
-    # Draw board
-    cells = []
-    for i in range(HEIGHT):
-        row = []
-        for j in range(WIDTH):
-
-            # Draw rectangle for cell
-            rect = pygame.Rect(
-                board_origin[0] + j * cell_size,
-                board_origin[1] + i * cell_size,
-                cell_size, cell_size
-            )
-            pygame.draw.rect(screen, GRAY, rect)
-            pygame.draw.rect(screen, WHITE, rect, 3)
-
-            # Add a mine, flag, or number if needed
-            if game.is_mine((i, j)) and lost:
-                screen.blit(mine, rect)
-            elif (i, j) in flags:
-                screen.blit(flag, rect)
-            elif (i, j) in revealed:
-                neighbors_num = str(game.nearby_mines((i, j)))
-                neighbors = smallFont.render(
-                    neighbors_num,
-                    True, NUM_COLORS[neighbors_num]
-                )
-                neighborsTextRect = neighbors.get_rect()
-                neighborsTextRect.center = rect.center
-                screen.blit(neighbors, neighborsTextRect)
-
-            row.append(rect)
-        cells.append(row)
-
-    # AI Move button
-    aiButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("AI Move", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = aiButton.center
-    pygame.draw.rect(screen, WHITE, aiButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Reset button
-    resetButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("Reset", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = resetButton.center
-    pygame.draw.rect(screen, WHITE, resetButton)
-    screen.blit(buttonText, buttonRect)
+    for button, mouse in clicks:
+        cell = cell_at(mouse)
+
+        # Check for a right-click to toggle flagging
+        if button == 3 and not lost:
+            if cell is not None and cell not in revealed:
+                if cell in flags:
+                    flags.remove(cell)
+                else:
+                    flags.add(cell)
+                dirty.add(cell)
+
+        elif button == 1:
+
+            # If AI button clicked, ask the AI for a move
+            if aiButton.collidepoint(mouse) and not lost:
+                if not thinking:
+                    requests.put(("move", game_number))
+                    thinking = True
+
+            # Let the AI play by itself, or stop it
+            elif playButton.collidepoint(mouse) and not lost:
+                playing = not playing
+
+            # Reset game state
+            elif resetButton.collidepoint(mouse):
+                game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
+                game_number += 1
+                requests.put(("reset", None))
+                revealed.clear()
+                flags.clear()
+                lost = False
+                playing = False
+                thinking = False
+                dirty.update(every_cell)
+
+            # User-made move
+            elif not lost and cell is not None:
+                if cell not in flags and cell not in revealed:
+                    lost = make_move(cell)
+
+    # Make any moves the AI has come up with since the last frame
+    while True:
+        try:
+            number, move, safe, mines = replies.get_nowait()
+        except queue.Empty:
+            break
+        if number != game_number:
+            continue
+        thinking = False
+        if move is None:
+            dirty.update(flags | mines)
+            flags.clear()
+            flags.update(mines)
+            playing = False
+            print("No moves left to make.")
+        elif not lost and move not in revealed:
+            if not playing:
+                if safe:
+                    print("AI making safe move.")
+                else:
+                    print("No known safe moves, AI making random move.")
+            lost = make_move(move)
+    if lost:
+        playing = False
+
+    # Keep the AI playing by itself
+    if playing and not thinking:
+        requests.put(("move", game_number))
+        thinking = True
+
+    # Draw only the cells that have changed
+    updated = []
+    for i, j in dirty:
+        rect = cells[i][j]
+        screen.blit(tile, rect)
+
+        # Add a mine, flag, or number if needed
+        if game.is_mine((i, j)) and lost:
+            screen.blit(mine, rect)
+        elif (i, j) in flags:
+            screen.blit(flag, rect)
+        elif (i, j) in revealed:
+            neighbors = numbers[game.nearby_mines((i, j))]
+            neighborsTextRect = neighbors.get_rect()
+            neighborsTextRect.center = rect.center
+            screen.blit(neighbors, neighborsTextRect)
+
+        updated.append(rect)
+    dirty.clear()
+
+    # Redraw the side panel
+    pygame.draw.rect(screen, BLACK, panel)
+    for button, label in [
+        (aiButton, "AI Move"),
+        (resetButton, "Reset"),
+        (playButton, "AI Stop" if playing else "AI Play")
+    ]:
+        buttonText = labels[label]
+        buttonRect = buttonText.get_rect()
+        buttonRect.center = button.center
+        pygame.draw.rect(screen, WHITE, button)
+        screen.blit(buttonText, buttonRect)
 
     # Display text
     text = "Lost" if lost else "Won" if game.mines == flags else ""
-    text = mediumFont.render(text, True, WHITE)
+    text = results[text]
     textRect = text.get_rect()
     textRect.center = ((5 / 6) * width, (2 / 3) * height)
     screen.blit(text, textRect)
+    updated.append(panel)
 
-    move = None
-
-    left, _, right = pygame.mouse.get_pressed()
-
-    # Check for a right-click to toggle flagging
-    if right == 1 and not lost:
-        mouse = pygame.mouse.get_pos()
-        for i in range(HEIGHT):
-            for j in range(WIDTH):
-                if cells[i][j].collidepoint(mouse) and (i, j) not in revealed:
-                    if (i, j) in flags:
-                        flags.remove((i, j))
-                    else:
-                        flags.add((i, j))
-                    time.sleep(0.2)
-
-    elif left == 1:
-        mouse = pygame.mouse.get_pos()
-
-        # If AI button clicked, make an AI move
-        if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
-                if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
-                else:
-                    print("No known safe moves, AI making random move.")
-            else:
-                print("AI making safe move.")
-            time.sleep(0.05)
-
-        # Reset game state
-        elif resetButton.collidepoint(mouse):
-            game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
-            revealed = set()
-            flags = set()
-            lost = False
-            continue
-
-        # User-made move
-        elif not lost:
-            for i in range(HEIGHT):
-                for j in range(WIDTH):
-                    if (cells[i][j].collidepoint(mouse)
-                            and (i, j) not in flags
-                            and (i, j) not in revealed):
-                        move = (i, j)
-
-    # Make move and update AI knowledge
-    if move:
-        if game.is_mine(move):
-            lost = True
-        else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
-
-    pygame.display.flip()
+    pygame.display.update(updated)
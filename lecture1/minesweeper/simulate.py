@@ -0,0 +1,172 @@
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from minesweeper import ArrayMinesweeper, MinesweeperAI
+
+# Boards played by default, as (height, width, mines)
+BOARDS = {
+    "beginner": (9, 9, 10),
+    "intermediate": (16, 16, 40),
+    "expert": (16, 30, 99)
+}
+
+# Default number of games per board
+GAMES = 1000
+
+# Most games handed to a worker at a time
+CHUNK = 50
+
+# Latencies are kept in logarithmic buckets, from 1 microsecond upwards
+BUCKETS_PER_DECADE = 20
+BUCKETS = 8 * BUCKETS_PER_DECADE
+SMALLEST = 1e-6
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def bucket(seconds):
+    """Returns the histogram bucket for a latency."""
+    if seconds <= SMALLEST:
+        return 0
+    index = int(math.log10(seconds / SMALLEST) * BUCKETS_PER_DECADE) + 1
+    return min(index, BUCKETS - 1)
+
+
+def bucket_limit(index):
+    """Returns the largest latency that falls in a bucket."""
+    return SMALLEST * 10 ** (index / BUCKETS_PER_DECADE)
+
+
+def play(height, width, mines, seed):
+    """
+    Plays one game with the AI, without any display.
+
+    Returns whether the game was won, how many guesses the AI made, and
+    the time taken to learn from each move.
+    """
+    random.seed(seed)
+    game = ArrayMinesweeper(height=height, width=width, mines=mines,
+                            seed=seed)
+    ai = MinesweeperAI(height=height, width=width, mines=mines)
+    guesses = 0
+    latencies = []
+    while True:
+
+        # Play a safe move if one is known, otherwise guess
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            if move is None:
+                break
+            guesses += 1
+
+        if game.is_mine(move):
+            return False, guesses, latencies
+
+        # Zero regions are revealed and learned about in one go
+        counts = game.reveal(move, ai.moves_made)
+        start = time.perf_counter()
+        ai.add_knowledge_many(counts)
+        latencies.append(time.perf_counter() - start)
+
+    return ai.mines == game.mines, guesses, latencies
+
+
+def play_many(board, seeds):
+    """
+    Plays a game for each seed, returning the number of games won, the
+    total number of guesses and a histogram of time spent learning.
+    """
+    wins = 0
+    guesses = 0
+    histogram = [0] * BUCKETS
+    for seed in seeds:
+        won, count, latencies = play(*board, seed)
+        wins += won
+        guesses += count
+        for seconds in latencies:
+            histogram[bucket(seconds)] += 1
+    return wins, guesses, histogram
+
+
+def play_chunk(task):
+    return play_many(*task)
+
+
+def percentile(histogram, q):
+    """Returns an upper bound on the q-th percentile of a histogram."""
+    target = sum(histogram) * q / 100
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if count and seen >= target:
+            return bucket_limit(index)
+    return 0
+
+
+def simulate(board, games, processes=None, seed=0):
+    """
+    Plays `games` seeded games on a board across a process pool.
+
+    Returns a dictionary with the win rate, the mean number of guesses
+    per game, the number of moves and percentiles of time spent learning.
+    """
+    # Split the games into enough chunks to keep every worker busy
+    workers = processes or os.cpu_count() or 1
+    size = max(1, min(CHUNK, games // (4 * workers)))
+    seeds = range(seed, seed + games)
+    tasks = [(board, seeds[i:i + size]) for i in range(0, games, size)]
+
+    wins = 0
+    guesses = 0
+    histogram = [0] * BUCKETS
+    with multiprocessing.Pool(processes) as pool:
+        for won, count, counts in pool.imap_unordered(play_chunk, tasks):
+            wins += won
+            guesses += count
+            histogram = [a + b for a, b in zip(histogram, counts)]
+
+    return {
+        "win_rate": wins / games,
+        "guesses": guesses / games,
+        "moves": sum(histogram),
+        "latency": {q: percentile(histogram, q) for q in PERCENTILES}
+    }
+
+
+def parse_board(text):
+    """Reads a board name, or a size written as HEIGHTxWIDTHxMINES."""
+    if text in BOARDS:
+        return BOARDS[text]
+    height, width, mines = map(int, text.split("x"))
+    return height, width, mines
+
+
+def main():
+
+    # Usage: python simulate.py [games] [board ...]
+    args = sys.argv[1:]
+    games = int(args.pop(0)) if args and args[0].isdigit() else GAMES
+    boards = args or list(BOARDS)
+
+    for text in boards:
+        board = parse_board(text)
+        start = time.perf_counter()
+        stats = simulate(board, games)
+        seconds = time.perf_counter() - start
+
+        print(f"{text} ({board[0]}x{board[1]}, {board[2]} mines), "
+              f"{games} games in {seconds:.1f} s")
+        print(f"    win rate: {stats['win_rate']:.1%}")
+        print(f"    guesses per game: {stats['guesses']:.2f}")
+        print(f"    learning from {stats['moves']} moves:")
+        for q, limit in stats["latency"].items():
+            print(f"        p{q:<5} <= {limit * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import itertools
+import time
+
+from minesweeper import FrozenSentence, MinesweeperAI
+
+
+def chain(ai, length):
+    """Tells the AI that every two neighboring cells hold one mine."""
+    for j in range(length - 1):
+        ai.add_sentence(FrozenSentence({(0, j), (0, j + 1)}, 1))
+    ai.infer()
+
+
+def test_count_solutions_matches_brute_force():
+    sentences = [
+        FrozenSentence({(0, 0), (0, 1), (0, 2)}, 1),
+        FrozenSentence({(0, 2), (0, 3)}, 1),
+        FrozenSentence({(0, 3), (0, 4), (0, 5)}, 2),
+        FrozenSentence({(1, 0)}, 0)
+    ]
+    cells = set().union(*[sentence.cells for sentence in sentences])
+    ai = MinesweeperAI(height=2, width=6)
+    order, totals, mines, exact = ai.count_solutions(
+        cells, sentences, time.perf_counter() + 10
+    )
+    assert exact
+
+    expected_totals = dict()
+    expected_mines = dict()
+    for values in itertools.product((0, 1), repeat=len(order)):
+        mine = dict(zip(order, values))
+        if all(sum(mine[cell] for cell in sentence.cells) == sentence.count
+               for sentence in sentences):
+            k = sum(values)
+            expected_totals[k] = expected_totals.get(k, 0) + 1
+            row = expected_mines.setdefault(k, [0] * len(order))
+            for i, value in enumerate(values):
+                row[i] += value
+    assert totals == expected_totals
+    assert mines == expected_mines
+
+
+def test_sampling_finds_solutions_of_long_chain():
+    ai = MinesweeperAI(height=1, width=200)
+    chain(ai, 200)
+    (cells, sentences), = ai.components()
+    _, totals, _, exact = ai.count_solutions(
+        cells, sentences, time.perf_counter() + 2, sample=True
+    )
+    assert not exact
+    assert sum(totals.values()) > 0
+
+
+def test_guess_on_large_component():
+    length = 2101
+    ai = MinesweeperAI(height=2, width=length, mines=length // 2 + 10,
+                       time_budget=0.5)
+    chain(ai, length)
+    assert [len(cells) for cells, _ in ai.components()] == [length]
+
+    move = ai.make_random_move()
+    assert move is not None and move not in ai.moves_made
+
+    # Only the two alternating placements fit, so neighbors add up to one
+    probabilities, _ = ai.mine_probabilities()
+    for j in range(length - 1):
+        total = probabilities[(0, j)] + probabilities[(0, j + 1)]
+        assert abs(total - 1) < 1e-9
+
+
+def test_safe_moves_skip_cells_already_played():
+    ai = MinesweeperAI(height=1, width=4)
+    for j in range(4):
+        ai.mark_safe((0, j))
+    ai.add_knowledge_many({(0, 0): 0, (0, 2): 0})
+    assert ai.make_safe_move() == (0, 1)
+    ai.add_knowledge((0, 1), 0)
+    assert ai.make_safe_move() == (0, 3)
+    assert ai.make_safe_moves() == {(0, 3)}
+    ai.add_knowledge((0, 3), 0)
+    assert ai.make_safe_move() is None
+
+
+def test_conclude_gives_every_solve_the_same_deadline(monkeypatch):
+    ai = MinesweeperAI(height=1, width=4)
+    deadlines = []
+
+    def solve(deadline):
+        deadlines.append(deadline)
+        return len(deadlines) < 3
+
+    monkeypatch.setattr(ai, "solve", solve)
+    ai.conclude()
+    assert len(deadlines) == 3 and len(set(deadlines)) == 1
@@ -1,17 +1,39 @@
+import array
+import multiprocessing
 import os
 import random
 import re
 import sys
+import time
 
-from numpy.random import choice
+import numpy as np
+from scipy.sparse import csr_matrix, identity, tril, triu
+from scipy.sparse.linalg import spsolve_triangular
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Random surfers walking side by side when sampling
+SURFERS = 10000
+
+# Iteration stops once ranks change by less than this in total
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 1000
+
+# Power iterations between quadratic extrapolations
+EXTRAPOLATION_PERIOD = 10
+
+# Bytes of an HTML file read at a time, and pages handed to a worker at
+# a time, when crawling
+CHUNK_SIZE = 1 << 16
+CRAWL_BATCH = 256
+
+LINK_PATTERN = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python pagerank.py corpus [method]")
     corpus = crawl(sys.argv[1])
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
@@ -22,6 +44,15 @@ def main():
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
+    # Optionally report how a given solver converges
+    if len(sys.argv) == 3:
+        pages, matrix, dangling = link_matrix(corpus)
+        stats = dict()
+        pagerank(matrix, dangling, DAMPING, method=sys.argv[2], stats=stats)
+        print(f"{sys.argv[2]}: {stats['iterations']} iterations, "
+              f"residual {stats['residuals'][-1]:.2e}, "
+              f"{stats['seconds']:.4f} s")
+
 
 def crawl(directory):
     """
@@ -50,6 +81,92 @@ def crawl(directory):
     return pages
 
 
+def crawl_edges(directory, processes=None):
+    """
+    Parse a directory of HTML pages for links to other pages, reading
+    pages in parallel without holding their contents in memory.
+
+    Return the list of pages, where each page's position is its id,
+    and arrays of source and target ids with one entry per link between
+    two different pages of the corpus (see `edge_matrix`).
+    """
+    # Give every page an id as it is listed
+    ids = dict()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html"):
+                ids[entry.name] = len(ids)
+    pages = list(ids)
+
+    # Workers send back only the links between ids, for a batch of
+    # pages at a time
+    sources = []
+    targets = []
+    batches = range(0, len(pages), CRAWL_BATCH)
+    with multiprocessing.Pool(processes, start_crawler,
+                              (directory, pages, ids)) as pool:
+        for batch_sources, batch_targets in pool.imap(page_edges, batches):
+            sources.append(np.frombuffer(batch_sources, np.int64))
+            targets.append(np.frombuffer(batch_targets, np.int64))
+
+    empty = [np.zeros(0, np.int64)]
+    return pages, np.concatenate(sources or empty), np.concatenate(
+        targets or empty
+    )
+
+
+crawler = dict()
+
+
+def start_crawler(directory, pages, ids):
+    """Sets up a worker process for `crawl_edges`."""
+    crawler["directory"] = directory
+    crawler["pages"] = pages
+    crawler["ids"] = ids
+
+
+def page_edges(start):
+    """
+    Return the links between pages of the corpus found on the batch of
+    pages starting at id `start`, as source and target ids packed into
+    bytes.
+    """
+    pages = crawler["pages"]
+    ids = crawler["ids"]
+    sources = array.array("q")
+    targets = array.array("q")
+    for source in range(start, min(start + CRAWL_BATCH, len(pages))):
+        path = os.path.join(crawler["directory"], pages[source])
+        for link in page_links(path):
+            target = ids.get(link)
+            if target is not None and target != source:
+                sources.append(source)
+                targets.append(target)
+    return sources.tobytes(), targets.tobytes()
+
+
+def page_links(path):
+    """
+    Return the set of pages linked to by an HTML file.
+    """
+    links = set()
+    with open(path, "rb") as f:
+        rest = b""
+        while chunk := f.read(CHUNK_SIZE):
+            contents = rest + chunk
+
+            # Leave a tag cut off by the end of the chunk for the next one
+            cut = contents.rfind(b"<")
+            if cut != -1 and contents.find(b">", cut) == -1:
+                contents, rest = contents[:cut], contents[cut:]
+            else:
+                rest = b""
+            links.update(LINK_PATTERN.findall(contents))
+        links.update(LINK_PATTERN.findall(rest))
+
+    return {os.fsdecode(link) for link in links}
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -97,24 +214,70 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # Initialize PageRank dictionary
-    pages_rank = dict()
-    
-    # Choose first page to visit by random (with equal chances)
-    pages_chain = [choice(list(corpus.keys()))]
-    
-    # Simulate 'n' random surfer pages visits according to 'transition_model' probabilities
-    for i in range(n - 1):
-        current_page = pages_chain[i]
-        pages_chance = transition_model(corpus, current_page, damping_factor)
-        pages_chain.append(choice(list(pages_chance.keys()), p=list(pages_chance.values())))
-        
-    # Find out PageRank of each page using the 'pages_chain' random surfer visited
-    for page in corpus.keys():
-        page_chance = pages_chain.count(page) / n
-        pages_rank[page] = page_chance
-        
-    return pages_rank
+    pages, matrix, dangling = link_matrix(corpus)
+    visits = sample_visits(matrix, dangling, damping_factor, n)
+    return dict(zip(pages, (visits / n).tolist()))
+
+
+def sample_visits(matrix, dangling, damping_factor, n, surfers=SURFERS,
+                  seed=None):
+    """
+    Return how many of `n` samples visit each page of a link matrix
+    (see `edge_matrix`), with many random surfers moving in lockstep,
+    each starting at a page at random.
+    """
+    rng = np.random.default_rng(seed)
+    pages = matrix.shape[0]
+
+    # Each column of the matrix lists the pages a page links to
+    links = matrix.tocsc()
+    first_link = links.indptr[:-1]
+    links_num = np.diff(links.indptr)
+
+    def step(current):
+        """Moves every surfer to its next page."""
+
+        # Surfers on pages without links, or who are not following a
+        # link, go to any page at random
+        following = (rng.random(len(current)) < damping_factor) & (
+            links_num[current] > 0
+        )
+        next_pages = rng.integers(pages, size=len(current))
+
+        # The rest follow one of the links on their page at random
+        sources = current[following]
+        choices = (rng.random(len(sources)) * links_num[sources]).astype(
+            np.int64
+        )
+        next_pages[following] = links.indices[first_link[sources] + choices]
+        return next_pages
+
+    # Walk until the starting pages hardly matter: the chance of never
+    # having jumped at random must fall below the sampling noise
+    current = rng.integers(pages, size=min(surfers, n))
+    if n > 1 and 0 < damping_factor < 1:
+        burn_in = int(np.ceil(np.log(n) / 2 / -np.log(damping_factor)))
+        for _ in range(burn_in):
+            current = step(current)
+
+    visits = np.zeros(pages, dtype=np.int64)
+    visited = []
+    buffered = 0
+    while n > 0:
+        visited.append(current[:n])
+        n -= len(visited[-1])
+        buffered += len(visited[-1])
+
+        # Count visits in batches, each at least as long as the corpus
+        if buffered >= pages or n <= 0:
+            visits += np.bincount(np.concatenate(visited), minlength=pages)
+            visited = []
+            buffered = 0
+
+        current = step(current)
+
+    return visits
+
 
 def iterate_pagerank(corpus, damping_factor):
     """
@@ -125,48 +288,214 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # Initialize PageRank dictionary
-    pages_rank = dict()
-    N = len(corpus) # Number of pages in corpus
-    precision = 4 # Precision of PageRank values
-    
-    # Start by assigning each page an equal PageRank
-    for page in corpus.keys():
-        pages_rank[page] = 1 / N
-        
-    # While changes are valuable according to 'precision'
-    changes = True
-    while changes:
-        changes = False
-        
-        # Iterate over each page, assign it a PageRank using iterative algorithm
-        for page1 in pages_rank.keys():
-            # Probability of visiting a page by damping_factor
-            page_rank = (1 - damping_factor) / N
-            
-            # Summing up probabilities of visiting a page from other pages
-            for page2 in pages_rank.keys():
-                # If looking at different pages
-                if page2 != page1:
-                    # Number of links page has
-                    links_num = len(corpus[page2])
-                    
-                    # If no links on page, interpret it as having one link for every page in the corpus (including itself)
-                    if not links_num:
-                        links_num = N
-                    
-                    # If page has links to PageRank calculating page increase PageRank value
-                    if page1 in corpus[page2] or links_num == N:
-                        page_rank += damping_factor * pages_rank[page2] / links_num
-            
-            # Check if changes are valuable according to 'precision'
-            if round(pages_rank[page1], precision) != round(page_rank, precision):
-                changes = True
-            
-            # Update page PageRank
-            pages_rank[page1] = page_rank
-    
-    return pages_rank
+    pages, matrix, dangling = link_matrix(corpus)
+    ranks = pagerank(matrix, dangling, damping_factor)
+    return dict(zip(pages, ranks.tolist()))
+
+
+def link_matrix(corpus):
+    """
+    Return the pages of a corpus in a fixed order, along with the sparse
+    link matrix and dangling pages of the corpus (see `edge_matrix`).
+    """
+    pages = sorted(corpus)
+    ids = {page: i for i, page in enumerate(pages)}
+    sources = [ids[page] for page in pages for link in corpus[page]]
+    targets = [ids[link] for page in pages for link in corpus[page]]
+    matrix, dangling = edge_matrix(len(pages), sources, targets)
+    return pages, matrix, dangling
+
+
+def edge_matrix(n, sources, targets):
+    """
+    Build the link matrix of `n` pages numbered from 0, where page
+    sources[i] links to page targets[i].
+
+    Return a column-stochastic CSR matrix whose entry (i, j) is the
+    chance of following a link from page j to page i, and a boolean
+    array marking pages without links.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+
+    # Merge repeated links, so that each one is counted only once
+    matrix = csr_matrix(
+        (np.ones(len(sources)), (targets, sources)), shape=(n, n)
+    )
+    matrix.sum_duplicates()
+
+    # Split each page's rank evenly between its links
+    links = np.bincount(matrix.indices, minlength=n)
+    matrix.data = 1 / links[matrix.indices]
+    return matrix, links == 0
+
+
+def pagerank(matrix, dangling, damping_factor, method="power",
+             tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+             stats=None):
+    """
+    Return the array of PageRank values for a link matrix (see
+    `edge_matrix`), iterating until ranks change by less than
+    `tolerance` in total.
+
+    `method` is one of "power", "jacobi", "gauss-seidel" or
+    "extrapolated". If a `stats` dictionary is given, it is filled with
+    the number of iterations, the change in ranks after each iteration
+    ("residuals") and the time taken in seconds.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"unknown method {method!r}")
+    start = time.perf_counter()
+    ranks, residuals = SOLVERS[method](
+        matrix, dangling, damping_factor, tolerance, max_iterations
+    )
+    if stats is not None:
+        stats["iterations"] = len(residuals)
+        stats["residuals"] = residuals
+        stats["seconds"] = time.perf_counter() - start
+    return ranks
+
+
+def power_step(matrix, dangling, damping_factor, ranks):
+    """
+    Return the ranks after one step of the random surfer.
+
+    Pages without links are treated as linking to every page, which
+    spreads their rank evenly rather than filling in the matrix.
+    """
+    n = matrix.shape[0]
+    spread = damping_factor * ranks[dangling].sum() + 1 - damping_factor
+    return damping_factor * (matrix @ ranks) + spread / n
+
+
+def power_iteration(matrix, dangling, damping_factor, tolerance,
+                    max_iterations):
+    """
+    Return PageRank values and the change after each iteration,
+    by repeatedly following links.
+    """
+    n = matrix.shape[0]
+    ranks = np.full(n, 1 / n)
+    residuals = []
+    while len(residuals) < max_iterations:
+        new_ranks = power_step(matrix, dangling, damping_factor, ranks)
+        residuals.append(np.abs(new_ranks - ranks).sum())
+        ranks = new_ranks
+        if residuals[-1] < tolerance:
+            break
+    return ranks, residuals
+
+
+def extrapolated_iteration(matrix, dangling, damping_factor, tolerance,
+                           max_iterations):
+    """
+    Return PageRank values and the change after each iteration, by
+    power iteration with periodic quadratic extrapolation.
+
+    Every few steps, the last four iterates are used to cancel out the
+    two slowest-decaying error terms (Kamvar et al., 2003).
+    """
+    n = matrix.shape[0]
+    ranks = np.full(n, 1 / n)
+    history = [ranks]
+    residuals = []
+    while len(residuals) < max_iterations:
+        new_ranks = power_step(matrix, dangling, damping_factor, ranks)
+        history = history[-3:] + [new_ranks]
+
+        if len(history) == 4 and len(residuals) % EXTRAPOLATION_PERIOD == 0:
+            new_ranks = extrapolate(*history)
+            history = [new_ranks]
+
+        residuals.append(np.abs(new_ranks - ranks).sum())
+        ranks = new_ranks
+        if residuals[-1] < tolerance:
+            break
+    return ranks, residuals
+
+
+def extrapolate(x0, x1, x2, x3):
+    """
+    Return the quadratic extrapolation of four successive iterates.
+    """
+    y = np.column_stack([x1 - x0, x2 - x0])
+    gamma = np.linalg.lstsq(y, -(x3 - x0), rcond=None)[0]
+    beta0 = gamma[0] + gamma[1] + 1
+    beta1 = gamma[1] + 1
+    ranks = beta0 * x1 + beta1 * x2 + x3
+
+    # Extrapolating may overshoot, so keep ranks a distribution
+    ranks = np.maximum(ranks, 0)
+    return ranks / ranks.sum()
+
+
+def linear_system(matrix, damping_factor):
+    """
+    Return the matrix (I - dM) of the PageRank linear system.
+
+    Ranks are proportional to the solution y of (I - dM)y = 1, because
+    rank spread from pages without links reaches every page equally.
+    """
+    n = matrix.shape[0]
+    return (identity(n, format="csr") - damping_factor * matrix).tocsr()
+
+
+def jacobi_iteration(matrix, dangling, damping_factor, tolerance,
+                     max_iterations):
+    """
+    Return PageRank values and the change after each iteration,
+    by solving the linear system with the Jacobi method.
+    """
+    system = linear_system(matrix, damping_factor)
+    n = system.shape[0]
+    diagonal = system.diagonal()
+    rest = system - identity(n, format="csr").multiply(diagonal)
+    ones = np.ones(n)
+
+    ranks = np.full(n, 1 / n)
+    y = ones
+    residuals = []
+    while len(residuals) < max_iterations:
+        y = (ones - rest @ y) / diagonal
+        new_ranks = y / y.sum()
+        residuals.append(np.abs(new_ranks - ranks).sum())
+        ranks = new_ranks
+        if residuals[-1] < tolerance:
+            break
+    return ranks, residuals
+
+
+def gauss_seidel_iteration(matrix, dangling, damping_factor, tolerance,
+                           max_iterations):
+    """
+    Return PageRank values and the change after each iteration,
+    by solving the linear system with the Gauss-Seidel method.
+    """
+    system = linear_system(matrix, damping_factor)
+    n = system.shape[0]
+    lower = tril(system, format="csr")
+    upper = triu(system, 1, format="csr")
+    ones = np.ones(n)
+
+    ranks = np.full(n, 1 / n)
+    y = ones
+    residuals = []
+    while len(residuals) < max_iterations:
+        y = spsolve_triangular(lower, ones - upper @ y, lower=True)
+        new_ranks = y / y.sum()
+        residuals.append(np.abs(new_ranks - ranks).sum())
+        ranks = new_ranks
+        if residuals[-1] < tolerance:
+            break
+    return ranks, residuals
+
+
+SOLVERS = {
+    "power": power_iteration,
+    "jacobi": jacobi_iteration,
+    "gauss-seidel": gauss_seidel_iteration,
+    "extrapolated": extrapolated_iteration
+}
 
 
 if __name__ == "__main__":